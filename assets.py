@@ -0,0 +1,244 @@
+import pygame
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import render_font
+from image_cache import ImageCache
+
+
+class LazyAsset:
+    '''
+    Defines a handle to an asset (font, image, sound, music or text)
+    which is only loaded the first time it is used. Attributes of the
+    loaded asset can be reached through the handle itself, so a font
+    handle can render text like the font would.
+    '''
+
+    def __init__(self, name, kind, loader):
+        '''
+        Args:
+            name (string): name identifying the asset, e.g. its path
+            kind (string): type of asset, e.g. 'image' or 'sound'
+            loader (function): returns the asset when called without arguments
+        '''
+        self.name = name
+        self.kind = kind
+        self.loader = loader
+
+        self.asset = None
+        self.loaded = False
+        self.load_time = None  # Seconds taken by the loader
+
+        # Assets may be loaded by preload threads and the main thread at once
+        self.lock = threading.Lock()
+
+    def get(self):
+        '''Returns: the asset, loading it if this is its first use'''
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    started = time.perf_counter()
+
+                    self.asset = self.loader()
+                    self.load_time = time.perf_counter() - started
+                    self.loaded = True
+
+        return self.asset
+
+    def __getattr__(self, attribute):
+        '''Returns: an attribute of the loaded asset'''
+        if attribute.startswith('__'):  # e.g. copy and pickle probing the handle
+            raise AttributeError(attribute)
+
+        return getattr(self.get(), attribute)
+
+
+class AssetDict(dict):
+    '''
+    Defines a dictionary of constants whose lazy assets are loaded when
+    they are looked up, so e.g. GAME_CONSTANTS['GATE_IMAGE'] gives the
+    image itself the first time the gate is drawn.
+    '''
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+
+        if isinstance(value, LazyAsset):
+            return value.get()
+
+        return value
+
+
+def load_font(path, size):
+    '''Returns: pygame.font.Font of a given size, read from a font file'''
+    if not pygame.font.get_init():
+        pygame.font.init()
+
+    return pygame.font.Font(path, size)
+
+
+def load_image(path, size):
+    '''Returns: pygame.Surface with an image file scaled to a given size ([width, height])'''
+    return pygame.transform.scale(pygame.image.load(path), size)
+
+
+def load_sound(path):
+    '''Returns: pygame.mixer.Sound decoded from a sound file'''
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+
+    return pygame.mixer.Sound(path)
+
+
+def load_file(path):
+    '''Returns: bytes of a file, e.g. music streamed by pygame.mixer.music'''
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+class AssetRegistry:
+    '''
+    Defines a registry of the game's assets. Assets are declared as
+    lazy handles, loaded on first use or ahead of time by a background
+    preload. Images are converted to the pixel format of the display
+    once, and every entity using one gets a reference to the same
+    converted surface, instead of a copy.
+    '''
+
+    def __init__(self):
+        '''Initializes the lazy handles, the map of converted images and the usage counters'''
+        self.__lazy_assets = []
+        self.__surfaces = {}
+
+        # (path, size) of every image declared, and the cache of them already scaled
+        self.__scaled_images = []
+        self.image_cache = ImageCache()
+
+        self.conversions = 0
+        self.bytes_held = 0
+
+    def get(self, image):
+        '''
+        Returns the converted version of an image, converting it the
+        first time it is requested. The conversion depends on the pixel
+        format of the display, so without a display mode set (e.g. in
+        headless simulations) the image is returned as it is.
+
+        Args:
+            image (pygame.Surface): image as loaded from disk
+
+        Returns:
+            pygame.Surface: image converted to the display pixel format
+        '''
+        if image not in self.__surfaces:
+            if pygame.display.get_surface() is None:
+                return image
+
+            surface = image.convert_alpha()
+
+            self.__surfaces[image] = surface
+
+            self.conversions += 1
+            self.bytes_held += surface.get_pitch() * surface.get_height()
+
+        return self.__surfaces[image]
+
+    def lazy(self, name, kind, loader):
+        '''Returns: a new LazyAsset, registered so it can be preloaded'''
+        lazy_asset = LazyAsset(name, kind, loader)
+        self.__lazy_assets.append(lazy_asset)
+
+        return lazy_asset
+
+    def font(self, path, size):
+        '''Returns: lazy handle of a font of a given size'''
+        return self.lazy(f'{path} {size}', 'font', lambda: load_font(path, size))
+
+    def image(self, path, size):
+        '''Returns: lazy handle of an image scaled to a given size ([width, height])'''
+        self.__scaled_images.append((path, size))
+
+        return self.lazy(f'{path} {size[0]}x{size[1]}', 'image', lambda: self.load_image(path, size))
+
+    def images(self, paths, size):
+        '''Returns: lazy handle of a list of images, all scaled to a given size'''
+        self.__scaled_images += [(path, size) for path in paths]
+
+        return self.lazy(
+            ', '.join(paths), 'image', lambda: [self.load_image(path, size) for path in paths]
+        )
+
+    def load_image(self, path, size):
+        '''
+        Returns: pygame.Surface with an image scaled to a given size,
+        taken from the image cache if it holds an up to date copy,
+        decoded and scaled from the image file otherwise
+        '''
+        image = self.image_cache.get(path, size)
+
+        if image is None:
+            image = load_image(path, size)
+
+        return image
+
+    def get_scaled_images(self):
+        '''Returns: list of (path, size) of every image declared, as stored in the image cache'''
+        return list(self.__scaled_images)
+
+    def sound(self, path):
+        '''Returns: lazy handle of a sound effect'''
+        return self.lazy(path, 'sound', lambda: load_sound(path))
+
+    def music(self, path):
+        '''Returns: lazy handle of the bytes of a music file'''
+        return self.lazy(path, 'music', lambda: load_file(path))
+
+    def text(self, text, font, color=[0, 0, 0]):
+        '''Returns: lazy handle of a text rendered with a (lazy) font'''
+        return self.lazy(text, 'text', lambda: render_font(text, font=font, color=color))
+
+    def preload(self, kinds=('image', 'sound', 'music'), workers=4):
+        '''
+        Starts loading every lazy asset of the given kinds in a pool of
+        background threads, so they are ready by the time a screen uses
+        them. Assets a screen needs before then are simply loaded by the
+        main thread. Errors (e.g. a missing file) are raised again when
+        the asset is used.
+
+        Args:
+            kinds (tuple): kinds of assets to be loaded
+            workers (int): number of threads loading assets
+
+        Returns:
+            list: concurrent.futures.Future of each asset being loaded
+        '''
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='preload')
+
+        futures = [
+            executor.submit(lazy_asset.get) for lazy_asset in self.__lazy_assets
+            if lazy_asset.kind in kinds and not lazy_asset.loaded
+        ]
+
+        executor.shutdown(wait=False)
+
+        return futures
+
+    def get_load_times(self):
+        '''Returns: list of (name, kind, seconds taken to load) of every loaded lazy asset'''
+        return [
+            (lazy_asset.name, lazy_asset.kind, lazy_asset.load_time)
+            for lazy_asset in self.__lazy_assets if lazy_asset.loaded
+        ]
+
+    def get_stats(self):
+        '''Returns: dictionary with the assets declared and loaded, images held, conversions made and bytes held'''
+        return {
+            'assets': len(self.__lazy_assets),
+            'loaded': sum(1 for lazy_asset in self.__lazy_assets if lazy_asset.loaded),
+            'images': len(self.__surfaces),
+            'conversions': self.conversions,
+            'bytes_held': self.bytes_held,
+        }
+
+
+ASSETS = AssetRegistry()
@@ -0,0 +1,172 @@
+'''
+Batch runner for difficulty tuning. Sweeps every combination of the
+given difficulties, spawn times, enemy speeds and player profiles,
+simulating many games of each across a pool of processes. Per-game
+results are streamed as they finish (optionally into a JSON lines
+file) and summarized per combination at the end.
+
+Usage: python batch.py --games 200 --spawn-times 1500 3000 5000 --answer-times 2 3 4
+'''
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulation import run_batch, summarize
+
+
+def simulate_chunk(combination, first_seed, games):
+    '''
+    Simulates consecutive games of one combination of settings. Runs
+    in a worker process, so it only takes and returns plain data.
+
+    Args:
+        combination (dict): game and player settings shared by the games
+        first_seed (int): seed of the first game, the others follow it
+        games (int): number of games to simulate
+
+    Returns:
+        list: results of each game, including its combination and seed
+    '''
+    results = run_batch(
+        games, first_seed, combination['answer_time'], combination['answer_time_sd'], combination['accuracy'],
+        is_easy=combination['is_easy'], spawn_time=combination['spawn_time'],
+        enemy_speed=combination['enemy_speed'], max_time=combination['max_time'], pool_size=combination['pool_size']
+    )
+
+    for seed, result in enumerate(results, first_seed):
+        result.update(combination, seed=seed)
+
+    return results
+
+
+def build_combinations(arguments):
+    '''Returns: list with one dictionary of settings per combination of the command line values'''
+    combinations = []
+
+    for difficulty, spawn_time, enemy_speed, answer_time, accuracy in itertools.product(
+        arguments.difficulties, arguments.spawn_times, arguments.enemy_speeds,
+        arguments.answer_times, arguments.accuracies
+    ):
+        combinations.append({
+            'is_easy': difficulty == 'easy',
+            'spawn_time': spawn_time,
+            'enemy_speed': enemy_speed,
+            'answer_time': answer_time,
+            'answer_time_sd': arguments.answer_time_sd,
+            'accuracy': accuracy,
+            'max_time': arguments.max_time,
+            'pool_size': arguments.pool_size,
+        })
+
+    return combinations
+
+
+def combination_key(combination):
+    '''Returns: hashable key identifying the settings of a combination'''
+    return tuple(sorted(combination.items()))
+
+
+def run_sweep(combinations, games, seed=0, workers=None, chunk_size=10, on_result=None):
+    '''
+    Simulates games for every combination across a pool of processes.
+
+    Args:
+        combinations (list): dictionaries of settings built by build_combinations
+        games (int): games to simulate per combination
+        seed (int): seed of the first game of each combination
+        workers (int): number of worker processes, defaults to the CPU count
+        chunk_size (int): games sent to a worker at once
+        on_result (function): called with each game's result as soon as it arrives, optional
+
+    Returns:
+        dict: list of results of each combination, keyed by combination_key
+    '''
+    results = {combination_key(combination): [] for combination in combinations}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}  # Maps each chunk being simulated to its combination's key
+
+        for combination in combinations:
+            for first_seed in range(seed, seed + games, chunk_size):
+                chunk_games = min(chunk_size, seed + games - first_seed)
+                future = executor.submit(simulate_chunk, combination, first_seed, chunk_games)
+                futures[future] = combination_key(combination)
+
+        for future in as_completed(futures):
+            for result in future.result():
+                results[futures[future]].append(result)
+
+                if on_result:
+                    on_result(result)
+
+    return results
+
+
+def parse_arguments():
+    '''Returns: command line arguments of the batch runner'''
+    parser = argparse.ArgumentParser(description='Sweeps simulated games of The Meditating Ninja across processes.')
+    parser.add_argument('--games', type=int, default=100, help='games simulated per combination')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game of each combination')
+    parser.add_argument('--difficulties', nargs='+', choices=['easy', 'hard'], default=['easy', 'hard'])
+    parser.add_argument('--spawn-times', nargs='+', type=float, default=[1500, 5000], help='milliseconds between spawns')
+    parser.add_argument('--enemy-speeds', nargs='+', type=float, default=[180], help='pixels per second')
+    parser.add_argument('--answer-times', nargs='+', type=float, default=[3.0], help='mean seconds to answer')
+    parser.add_argument('--answer-time-sd', type=float, default=1.0, help='standard deviation of the answer time')
+    parser.add_argument('--accuracies', nargs='+', type=float, default=[0.9], help='probabilities of a right answer')
+    parser.add_argument('--max-time', type=float, default=600, help='seconds of game time after which a game stops')
+    parser.add_argument('--pool-size', type=int, help='capacity of the pools of entities, defaults to every enemy spawned')
+    parser.add_argument('--workers', type=int, help='worker processes, defaults to the CPU count')
+    parser.add_argument('--chunk-size', type=int, default=10, help='games sent to a worker at once')
+    parser.add_argument('--output', help='JSON lines file receiving every game result as it finishes')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+
+    combinations = build_combinations(arguments)
+    total = len(combinations) * arguments.games
+
+    output = open(arguments.output, 'w') if arguments.output else None
+    finished = [0]
+
+    def on_result(result):
+        '''Streams a game result to the output file and reports progress'''
+        finished[0] += 1
+
+        if output:
+            output.write(json.dumps(result) + '\n')
+
+        if finished[0] % 100 == 0 or finished[0] == total:
+            print(f'\r{finished[0]}/{total} games', end='', file=sys.stderr)
+
+    start = time.perf_counter()
+
+    try:
+        results = run_sweep(
+            combinations, arguments.games, arguments.seed, arguments.workers, arguments.chunk_size, on_result
+        )
+    finally:
+        if output:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f'\n{total} games in {elapsed:.2f}s with {arguments.workers or os.cpu_count()} workers', file=sys.stderr)
+
+    for combination in combinations:
+        summary = summarize(results[combination_key(combination)])
+
+        settings = ', '.join(
+            f'{name}={value}' for name, value in combination.items() if name not in ('max_time', 'pool_size')
+        )
+        survival, iq = summary['survival_time'], summary['iq']
+
+        print(f"{settings}: survival p50 {survival['p50']:.1f}s mean {survival['mean']:.1f}s, "
+              f"IQ p50 {iq['p50']} mean {iq['mean']:.1f}")
+
+        if summary['games_refused']:
+            print(f"  warning: full pools refused entities in {summary['games_refused']} games, raise --pool-size")
@@ -0,0 +1,329 @@
+'''
+Benchmark suite of the game, run headless under the SDL dummy video
+and audio drivers. It times the frame loop of the game screen with a
+growing number of entities on screen, the collision scan, the panel's
+key press handling, question generation, the high scores ranking, and
+a cold import of the constants. Every benchmark reports percentiles of
+its samples, and the results are written as JSON so runs can be
+compared: with --baseline, benchmarks whose median got slower than
+the baseline's by more than --threshold are listed and the exit code
+is 1.
+
+Usage: python benchmark.py [--output results.json] [--baseline old.json] [--quick]
+'''
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import pygame
+
+pygame.init()
+pygame.display.set_mode([600, 400])
+
+import game
+from constants import MUSIC_CONSTANTS
+from game import Game, resume_gc
+from game_utils import Question, Panel, ShurikenController, EnemyNinjaController, CollisionController, MeditatingNinja
+from scheduler import AdaptiveScheduler
+from utils import Ranking, percentile
+
+# No music is played headless, so the music files (not part of the repository) are never read
+game.play_music = lambda track: None
+MUSIC_CONSTANTS.update(MENU=b'', GAME=b'')
+
+# Numbers of entities on screen the frame loop and the collision scan are timed with
+ENTITY_COUNTS = [0, 10, 100, 1000]
+
+# Numbers of players the ranking is timed with
+PLAYER_COUNTS = [10, 10000, 100000]
+
+
+def summarize(samples):
+    '''
+    Args:
+        samples (list): seconds taken by each run of a benchmark
+
+    Returns:
+        dict: number of samples, and their mean, percentiles and maximum in milliseconds
+    '''
+    samples = sorted(samples)
+
+    return {
+        'samples': len(samples),
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p95_ms': percentile(samples, 0.95) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'max_ms': samples[-1] * 1000,
+    }
+
+
+def time_calls(function, runs):
+    '''Returns: seconds taken by each of a number of calls of a function'''
+    samples = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+
+    return samples
+
+
+def place_entities(shuriken_controller, enemy_ninja_controller, count, rng):
+    '''
+    Fills the lanes with count entities standing still on screen, half
+    shurikens and half enemy ninjas, placed so that none of them hit
+    each other or the meditating ninja. Every frame then draws all of
+    them, while the game goes on as usual.
+    '''
+    shuriken_controller.speed = 0
+    enemy_ninja_controller.speed = 0
+
+    # Enemies stand between the ninja and the side they come from, shurikens on the other side of the ninja
+    enemy_ranges = {'RIGHT': (360, 518), 'LEFT': (0, 160)}
+    shuriken_ranges = {'RIGHT': (0, 200), 'LEFT': (400, 560)}
+
+    for i in range(count):
+        side = 'RIGHT' if i % 4 < 2 else 'LEFT'
+
+        if i % 2:
+            enemy_ninja_controller.store.place(enemy_ninja_controller.spawn(side), rng.uniform(*enemy_ranges[side]))
+        else:
+            shuriken_controller.store.place(shuriken_controller.throw(side), rng.uniform(*shuriken_ranges[side]))
+
+
+def bench_render_frame(count, frames, dirty_rects):
+    '''Returns: seconds taken by each frame of the game screen with count entities on screen'''
+    game = Game('BENCH', dirty_rects=dirty_rects, pool_size=max(count, 1))
+
+    # No new enemies come in, so the number of entities stays the same
+    game.enemy_ninja_controller.spawn_interval = float('inf')
+    place_entities(game.shuriken_controller, game.enemy_ninja_controller, count, random.Random(count))
+
+    game.render_frame()  # The first frame draws the whole screen
+
+    samples = time_calls(game.render_frame, frames)
+
+    resume_gc(game.gc_mode)  # The game never ends on its own
+
+    if game.core.over or game.shuriken_controller.get_live_count() + game.enemy_ninja_controller.get_live_count() != count:
+        raise RuntimeError('entities of the render benchmark collided')
+
+    return samples
+
+
+def make_collision_controller(count):
+    '''Returns: a CollisionController whose lanes hold count entities which do not collide'''
+    panel = Panel(is_easy=False, rng=random.Random(0))
+    shuriken_controller = ShurikenController(panel, capacity=count)
+    enemy_ninja_controller = EnemyNinjaController(spawn_time=float('inf'), capacity=count)
+
+    place_entities(shuriken_controller, enemy_ninja_controller, count, random.Random(count))
+
+    return CollisionController(MeditatingNinja(), shuriken_controller, enemy_ninja_controller, panel, None)
+
+
+def bench_collisions(count, runs):
+    '''
+    Returns: seconds taken by each scan for collisions with count
+    entities in the lanes, and by each scan comparing every pair of a
+    lane (the fallback for lanes out of order)
+    '''
+    collision_controller = make_collision_controller(count)
+
+    def scan_every_pair():
+        for side in ('RIGHT', 'LEFT'):
+            collision_controller.scan_lane_scored(side)
+
+    return time_calls(collision_controller.scan_for_collisions, runs), time_calls(scan_every_pair, max(1, runs // 100))
+
+
+def bench_process_keyboard(keystrokes):
+    '''Returns: seconds taken by each key press of the player answering questions, right or wrong'''
+    rng = random.Random(0)
+    panel = Panel(is_easy=False, rng=rng)
+
+    samples = []
+
+    while len(samples) < keystrokes:
+        answer = panel.math_question.answer if rng.random() < 0.8 else '99'
+
+        keys = [pygame.key.key_code(character) for character in str(answer)]
+
+        if rng.random() < 0.1:  # A typo, erased and typed again
+            keys += [pygame.K_BACKSPACE, keys[-1]]
+
+        for key in keys + [pygame.K_RETURN]:
+            start = time.perf_counter()
+            panel.process_keyboard(key)
+            samples.append(time.perf_counter() - start)
+
+    return samples
+
+
+def bench_questions(is_easy, runs, scheduler=None):
+    '''Returns: seconds taken by each new question of a difficulty'''
+    question = Question(is_easy, random.Random(0), scheduler)
+
+    return time_calls(question.new_question, runs)
+
+
+def bench_ranking(players, records):
+    '''
+    Times the high scores of a file with a number of players.
+
+    Returns:
+        tuple: seconds taken by each load of the file, and by each new record saved
+    '''
+    path = os.path.join(tempfile.mkdtemp(), 'high_scores.txt')
+    rng = random.Random(players)
+
+    Ranking(path).new_records([(f'PLAYER{i}', rng.randrange(1000)) for i in range(players)])
+
+    loads = time_calls(lambda: Ranking(path), 5 if players > 10000 else 20)
+
+    ranking = Ranking(path)
+    new_records = time_calls(lambda: ranking.new_record(f'PLAYER{rng.randrange(players)}', rng.randrange(2000)), records)
+
+    return loads, new_records
+
+
+def bench_import(runs):
+    '''
+    Imports pygame and then the constants in a new interpreter, runs times.
+
+    Returns:
+        tuple: seconds taken by each import of pygame, and of the constants after it
+    '''
+    code = (
+        'import time; start = time.perf_counter(); import pygame; middle = time.perf_counter(); '
+        'import constants; print(middle - start, time.perf_counter() - middle)'
+    )
+
+    pygame_samples, constants_samples = [], []
+
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+
+        pygame_samples.append(float(output[-2]))
+        constants_samples.append(float(output[-1]))
+
+    return pygame_samples, constants_samples
+
+
+def run_benchmarks(quick=False):
+    '''
+    Runs every benchmark, printing progress to the standard error.
+
+    Args:
+        quick (bool): whether fewer samples are taken, for a fast check
+
+    Returns:
+        dict: summary of the samples of each benchmark, by name
+    '''
+    scale = 0.1 if quick else 1
+    results = {}
+
+    def record(name, samples):
+        results[name] = summarize(samples)
+        print(f"{name}: p50 {results[name]['p50_ms']:.3f} ms, p99 {results[name]['p99_ms']:.3f} ms", file=sys.stderr)
+
+    for count in ENTITY_COUNTS:
+        for dirty_rects in (True, False):
+            mode = 'dirty' if dirty_rects else 'full'
+            record(f'render_frame_{mode}[{count}]', bench_render_frame(count, int(600 * scale) or 1, dirty_rects))
+
+    for count in ENTITY_COUNTS[1:]:
+        scans, full_scans = bench_collisions(count, int(2000 * scale) or 1)
+        record(f'scan_for_collisions[{count}]', scans)
+        record(f'scan_lane_scored_every_pair[{count}]', full_scans)
+
+    record('process_keyboard', bench_process_keyboard(int(20000 * scale)))
+
+    record('new_question[easy]', bench_questions(True, int(20000 * scale)))
+    record('new_question[hard]', bench_questions(False, int(20000 * scale)))
+    record('new_question[hard, adaptive]', bench_questions(False, int(20000 * scale), AdaptiveScheduler(is_easy=False)))
+
+    for players in PLAYER_COUNTS:
+        if quick and players > 10000:
+            continue
+
+        loads, new_records = bench_ranking(players, int(200 * scale))
+        record(f'ranking_load[{players}]', loads)
+        record(f'ranking_new_record[{players}]', new_records)
+
+    pygame_imports, constants_imports = bench_import(3 if quick else 10)
+    record('import_pygame', pygame_imports)
+    record('import_constants', constants_imports)
+
+    return results
+
+
+def compare(results, baseline, threshold, min_difference=0.01):
+    '''
+    Returns: (name, baseline median, median) of every benchmark whose
+    median is more than threshold times the baseline's, and slower by
+    more than min_difference milliseconds (below which timings are noise)
+    '''
+    return [
+        (name, baseline[name]['p50_ms'], summary['p50_ms'])
+        for name, summary in results.items()
+        if name in baseline
+        and summary['p50_ms'] > baseline[name]['p50_ms'] * threshold
+        and summary['p50_ms'] - baseline[name]['p50_ms'] > min_difference
+    ]
+
+
+def parse_arguments():
+    '''Returns: command line arguments of the benchmark suite'''
+    parser = argparse.ArgumentParser(description='Benchmarks The Meditating Ninja headless.')
+    parser.add_argument('--output', help='file receiving the results as JSON, defaults to the standard output')
+    parser.add_argument('--baseline', help='results of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown of a median counted as a regression')
+    parser.add_argument('--quick', action='store_true', help='take fewer samples and skip the largest ranking')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+
+    report = {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'quick': arguments.quick,
+        'results': run_benchmarks(arguments.quick),
+    }
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare(report['results'], json.load(file)['results'], arguments.threshold)
+
+        for name, baseline_median, median in regressions:
+            print(f'regression: {name} p50 {baseline_median:.3f} ms -> {median:.3f} ms', file=sys.stderr)
+
+        if regressions:
+            sys.exit(1)
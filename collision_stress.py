@@ -0,0 +1,144 @@
+'''
+Stress test for the collision engine of the game. Both lanes are
+flooded with thousands of shurikens and enemy ninjas, every scan is
+checked against a brute force reference (each shuriken compared with
+every enemy, oldest first, as the original nested loop did), and the
+time taken by the scans is reported.
+
+Usage: python collision_stress.py [entities per step] [steps]
+'''
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+pygame.display.set_mode([600, 400])
+
+from constants import GAME_CONSTANTS
+from game_utils import MeditatingNinja, Panel, ShurikenController, EnemyNinjaController, CollisionController
+
+
+SHURIKEN_HALF_WIDTH = GAME_CONSTANTS['SHURIKEN_SIZE'][0] // 2
+ENEMY_NINJA_WIDTH = GAME_CONSTANTS['ENEMY_NINJA_SIZE'][0]
+
+
+def collides(shuriken_x, enemy_ninja_x):
+    '''Returns: whether the middle of a shuriken is between the sides of an enemy ninja'''
+    return enemy_ninja_x <= shuriken_x + SHURIKEN_HALF_WIDTH <= enemy_ninja_x + ENEMY_NINJA_WIDTH
+
+
+def live_entities(controller):
+    '''Returns: (serial, x) of every entity of a controller, in the order they were added'''
+    store = controller.store
+
+    return sorted((store.serials[slot], store.x[slot]) for lane in controller.lanes.values() for slot in lane)
+
+
+def reference_hits(shurikens, enemy_ninjas):
+    '''
+    Brute force reference of the scoring check: every shuriken is
+    compared with every enemy ninja of both sides, oldest first.
+
+    Args:
+        shurikens (list): (serial, x) of the shurikens, ordered by the time they were thrown
+        enemy_ninjas (list): (serial, x) of the enemy ninjas, ordered by the time they spawned
+
+    Returns:
+        tuple: sets of the serials of the shurikens and of the enemy ninjas removed by the check
+    '''
+    removed_shurikens, removed_enemy_ninjas = set(), set()
+
+    for shuriken, shuriken_x in shurikens:
+        for enemy_ninja, enemy_ninja_x in enemy_ninjas:
+            if enemy_ninja not in removed_enemy_ninjas and collides(shuriken_x, enemy_ninja_x):
+                removed_shurikens.add(shuriken)
+                removed_enemy_ninjas.add(enemy_ninja)
+                break
+
+    return removed_shurikens, removed_enemy_ninjas
+
+
+def run(per_step=20, steps=150, check_every=5):
+    '''
+    Runs the stress test. Every step adds per_step shurikens and per_step
+    enemy ninjas to each lane, moves every entity, and scans for collisions.
+
+    Args:
+        per_step (int): entities added to each lane of each kind per step
+        steps (int): number of steps to run
+        check_every (int): steps between comparisons against the reference
+
+    Returns:
+        dict: largest entity count, scan timings and number of mismatches
+    '''
+    meditating_ninja = MeditatingNinja()
+    panel = Panel(is_easy=False)
+    # Pools large enough for every entity added
+    shuriken_controller = ShurikenController(panel, capacity=2 * per_step * steps)
+    enemy_ninja_controller = EnemyNinjaController(spawn_time=float('inf'), capacity=2 * per_step * steps)
+
+    collision_controller = CollisionController(
+        meditating_ninja, shuriken_controller, enemy_ninja_controller, panel, None
+    )
+
+    scan_times = []
+    max_entities = 0
+    mismatches = 0
+
+    for step in range(steps):
+        for side in ('RIGHT', 'LEFT'):
+            for _ in range(per_step):
+                shuriken_controller.throw(side)
+                enemy_ninja_controller.spawn(side)
+
+        shuriken_controller.update(GAME_CONSTANTS['SIMULATION_STEP'])
+        enemy_ninja_controller.update(GAME_CONSTANTS['SIMULATION_STEP'])
+
+        shurikens = live_entities(shuriken_controller)
+        enemy_ninjas = live_entities(enemy_ninja_controller)
+
+        max_entities = max(max_entities, len(shurikens) + len(enemy_ninjas))
+
+        if step % check_every == 0:
+            expected = reference_hits(shurikens, enemy_ninjas)
+
+        start = time.perf_counter()
+        collision_controller.detect_player_scored()
+        scan_times.append(time.perf_counter() - start)
+
+        if step % check_every == 0:
+            removed = (
+                set(serial for serial, _ in shurikens) - set(serial for serial, _ in live_entities(shuriken_controller)),
+                set(serial for serial, _ in enemy_ninjas) - set(serial for serial, _ in live_entities(enemy_ninja_controller)),
+            )
+
+            if removed != expected:
+                mismatches += 1
+
+    scan_times.sort()
+
+    return {
+        'max_entities': max_entities,
+        'scans': len(scan_times),
+        'scan_median_ms': scan_times[len(scan_times) // 2] * 1000,
+        'scan_max_ms': scan_times[-1] * 1000,
+        'score': panel.score,
+        'mismatches': mismatches,
+    }
+
+
+if __name__ == '__main__':
+    per_step = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+
+    results = run(per_step, steps)
+
+    for key, value in results.items():
+        print(f'{key}: {value}')
+
+    if results['mismatches']:
+        sys.exit(1)
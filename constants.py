@@ -1,72 +1,135 @@
+import os
+import re
 import pygame
-from utils import render_font
-
-pygame.font.init()
-pygame.mixer.init()
+from assets import ASSETS, AssetDict
 
 SCREEN_NAMES = ['menu', 'hard_game', 'easy_game', 'how_to_play', 'high_scores']
 
-TINY_FONT = pygame.font.Font('freesansbold.ttf', 17)
-SMALL_FONT = pygame.font.Font('freesansbold.ttf', 18)
-INTERMEDIATE_FONT = pygame.font.Font('freesansbold.ttf', 24)
-MEDIUM_FONT = pygame.font.Font('freesansbold.ttf', 26)
-BIG_FONT = pygame.font.Font('freesansbold.ttf', 34)
+# Frames rendered per second at most, 0 renders as fast as possible
+FRAME_RATE_CAP = 60
+
+# host:port of the classroom leaderboard server (leaderboard.py), None keeps scores in high_scores.txt
+LEADERBOARD_ADDRESS = os.environ.get('NINJA_LEADERBOARD')
+
+# An address without a port cannot be reached, scores are kept in high_scores.txt instead
+if LEADERBOARD_ADDRESS and not re.fullmatch(r'.+:[0-9]+', LEADERBOARD_ADDRESS):
+    LEADERBOARD_ADDRESS = None
+
+# Decode images, sounds and music in background threads while the menu is shown
+PRELOAD_ASSETS = True
+
+# Fonts, images, sounds, music and texts are lazy handles, loaded the
+# first time they are used. Looking them up in the dictionaries below
+# gives the loaded asset itself.
+
+TINY_FONT = ASSETS.font('freesansbold.ttf', 17)
+SMALL_FONT = ASSETS.font('freesansbold.ttf', 18)
+INTERMEDIATE_FONT = ASSETS.font('freesansbold.ttf', 24)
+MEDIUM_FONT = ASSETS.font('freesansbold.ttf', 26)
+BIG_FONT = ASSETS.font('freesansbold.ttf', 34)
+
+TITLE = ASSETS.text('The Meditating Ninja', font=BIG_FONT)
+BACK = ASSETS.text('Press Q to go back.', font=MEDIUM_FONT)
+
+
+MUSIC_CONSTANTS = AssetDict({
+    'MENU': ASSETS.music('music/music_calm.wav'),
+    'GAME': ASSETS.music('music/game_soundtrack.wav'),
+})
 
 
-MENU_CONSTANTS = {
-    'TITLE': render_font('The Meditating Ninja', font=BIG_FONT),
-    'NAME': render_font('ENTER NAME: ', font=MEDIUM_FONT),
+MENU_CONSTANTS = AssetDict({
+    'TITLE': TITLE,
+    'NAME': ASSETS.text('ENTER NAME: ', font=MEDIUM_FONT),
     'NAME_BOX': pygame.Surface([250, 40]),
-    'WARNING': render_font('Type your name before playing.', font=SMALL_FONT),
-    'NINJA_IMAGE': pygame.transform.scale(pygame.image.load('images/m_ninja.png'), [183, 198]),
-}
+    'WARNING': ASSETS.text('Type your name before playing.', font=SMALL_FONT),
+    'NINJA_IMAGE': ASSETS.image('images/m_ninja.png', [183, 198]),
+})
 
 MENU_CONSTANTS['NAME_BOX'].fill([255, 255, 255])
 
 
-GAME_CONSTANTS = {
-    'GATE_IMAGE': pygame.transform.scale(pygame.image.load('images/gate.png'), [396, 295]),
-    'NINJA_IMAGE': pygame.transform.scale(pygame.image.load('images/m_ninja.png'), [110, 119]),
+GAME_CONSTANTS = AssetDict({
+    'GATE_IMAGE': ASSETS.image('images/gate.png', [396, 295]),
+    'NINJA_IMAGE': ASSETS.image('images/m_ninja.png', [110, 119]),
     'NINJA_SIZE': [110, 119],
     'NINJA_POSITION': [245, 281],
 
-    'SHURIKEN_IMAGE': pygame.transform.scale(pygame.image.load('images/shuriken.png'), [30, 30]),
+    'SHURIKEN_IMAGE': ASSETS.image('images/shuriken.png', [30, 30]),
     'SHURIKEN_SIZE': [30, 30],
     'SHURIKEN_POSITION': ([335, 321], [235, 321]),  # RIGHT, LEFT
-    'SHURIKEN_SPEED': 8,
+    'SHURIKEN_SPEED': 480,  # pixels per second
 
-    'ENEMY_NINJA_IMAGE': [pygame.transform.scale(pygame.image.load('images/redninja_right.png'), [82, 98]), pygame.transform.scale(pygame.image.load('images/redninja_left.png'), [82, 98])],
+    'ENEMY_NINJA_IMAGE': ASSETS.images(['images/redninja_right.png', 'images/redninja_left.png'], [82, 98]),
     'ENEMY_NINJA_SIZE': [82, 99],
     'ENEMY_NINJA_POSITION': ([650, 301], [-132, 301]),
-    'ENEMY_NINJA_SPEED': 3,
-
-    'PANEL_SHURIKEN_IMAGE': pygame.transform.scale(pygame.image.load('images/shuriken.png'), [35, 35]),
-
-    'GONG_SOUND': pygame.mixer.Sound('sounds/gong.ogg'),
-    'SHURIKEN_SOUND': pygame.mixer.Sound('sounds/shuriken.ogg'),
-}
-
-
-RULES_CONSTANTS = {
-    'TITLE': MENU_CONSTANTS['TITLE'],
-    'SUBTITLE': render_font('Rules', font=MEDIUM_FONT),
-    'BACK': render_font('Press Q to go back.', font=MEDIUM_FONT),
-    'RULE_1': render_font('1) Your objective is to meditate in order to get wiser.', font=SMALL_FONT),
-    'RULE_2': render_font('2) You need to stop evil ninjas from disturbing the meditation.', font=SMALL_FONT),
-    'RULE_3': render_font('3) You can stop evil ninjas by throwing a shuriken.', font=SMALL_FONT),
-    'RULE_4': render_font('4) To throw a shuriken to your right press RIGHT ARROW.', font=SMALL_FONT),
-    'RULE_5': render_font('5) To throw a shuriken to your left press LEFT ARROW.', font=SMALL_FONT),
-    'RULE_6': render_font('6) You need to answer a math question to get a shuriken.', font=SMALL_FONT),
-    'RULE_7': render_font('7) To answer, type a number on your keyboard & press RETURN.', font=SMALL_FONT),
-    'RULE_8': render_font('8) You get one shuriken per correct answer.', font=SMALL_FONT),
-    'RULE_9': render_font('9) You cannot skip a question.', font=SMALL_FONT),
-    'RULE_10': render_font('10) If an evil ninja reaches you, the game is over.', font=SMALL_FONT),
-    'RULE_11': render_font("11) Your score is the ninja's final IQ.", font=SMALL_FONT),
-}
-
-
-HIGH_SCORES_CONSTANTS = {
-    'TITLE': MENU_CONSTANTS['TITLE'],
-    'SUBTITLE': render_font('Top 10 High Scores', font=MEDIUM_FONT),
-    'BACK': RULES_CONSTANTS['BACK'],
-}
+    'ENEMY_NINJA_SPEED': 180,  # pixels per second
+
+    # Entities moving past either edge of the playfield are retired
+    'PLAYFIELD_WIDTH': 600,
+
+    # Shurikens and enemy ninjas that may be on screen at once, allocated
+    # before the game starts and reused afterwards
+    'SHURIKEN_POOL_SIZE': 64,
+    'ENEMY_NINJA_POOL_SIZE': 64,
+
+    # What the cyclic garbage collector does during a game, to avoid its
+    # pauses: 'freeze' (skips every object created before the game),
+    # 'disable' (collects once the game is over) or None (runs as usual)
+    'GC_MODE': 'freeze',
+
+    'PANEL_SHURIKEN_IMAGE': ASSETS.image('images/shuriken.png', [35, 35]),
+
+    # Game time advanced by each simulation step, and the longest frame
+    # time simulated at once (in seconds) so a stall does not fast-forward
+    'SIMULATION_STEP': 1 / 60,
+    'MAX_FRAME_TIME': 0.25,
+
+    # Seconds the scene stays frozen after an enemy reaches the ninja
+    'GAME_OVER_TIME': 2,
+
+    # Seconds to wait for the leaderboard server to save a score before saving it to the local file
+    'SAVE_TIMEOUT': 5,
+
+    # Redraw only the regions that changed each frame instead of the whole screen
+    'DIRTY_RECTS': True,
+
+    # Ask the questions the player gets wrong or answers slowly more often
+    'ADAPTIVE_QUESTIONS': True,
+
+    # Draw the numbers on the panel from pre-rendered digits instead of rendering them as texts
+    'GLYPH_ATLAS': True,
+
+    'GONG_SOUND': ASSETS.sound('sounds/gong.ogg'),
+    'SHURIKEN_SOUND': ASSETS.sound('sounds/shuriken.ogg'),
+})
+
+
+RULES_CONSTANTS = AssetDict({
+    'TITLE': TITLE,
+    'SUBTITLE': ASSETS.text('Rules', font=MEDIUM_FONT),
+    'BACK': BACK,
+    'RULE_1': ASSETS.text('1) Your objective is to meditate in order to get wiser.', font=SMALL_FONT),
+    'RULE_2': ASSETS.text('2) You need to stop evil ninjas from disturbing the meditation.', font=SMALL_FONT),
+    'RULE_3': ASSETS.text('3) You can stop evil ninjas by throwing a shuriken.', font=SMALL_FONT),
+    'RULE_4': ASSETS.text('4) To throw a shuriken to your right press RIGHT ARROW.', font=SMALL_FONT),
+    'RULE_5': ASSETS.text('5) To throw a shuriken to your left press LEFT ARROW.', font=SMALL_FONT),
+    'RULE_6': ASSETS.text('6) You need to answer a math question to get a shuriken.', font=SMALL_FONT),
+    'RULE_7': ASSETS.text('7) To answer, type a number on your keyboard & press RETURN.', font=SMALL_FONT),
+    'RULE_8': ASSETS.text('8) You get one shuriken per correct answer.', font=SMALL_FONT),
+    'RULE_9': ASSETS.text('9) You cannot skip a question.', font=SMALL_FONT),
+    'RULE_10': ASSETS.text('10) If an evil ninja reaches you, the game is over.', font=SMALL_FONT),
+    'RULE_11': ASSETS.text("11) Your score is the ninja's final IQ.", font=SMALL_FONT),
+})
+
+
+HIGH_SCORES_CONSTANTS = AssetDict({
+    'TITLE': TITLE,
+    'SUBTITLE': ASSETS.text('High Scores', font=MEDIUM_FONT),
+    'BACK': BACK,
+    'PAGE_HINT': ASSETS.text('LEFT/RIGHT: more', font=TINY_FONT),
+    'UNAVAILABLE': ASSETS.text('High scores unavailable', font=MEDIUM_FONT, color=[0, 0, 255]),
+
+    # High scores listed on each page of the leaderboard
+    'PAGE_SIZE': 10,
+})
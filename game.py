@@ -1,93 +1,289 @@
+import gc
 import pygame
-from constants import SCREEN_NAMES, GAME_CONSTANTS
-from utils import Ranking, Screen
-from game_utils import MeditatingNinja, Panel, ShurikenController, EnemyNinjaController, CollisionController
+import threading
+import time
+from constants import SCREEN_NAMES, GAME_CONSTANTS, MUSIC_CONSTANTS, LEADERBOARD_ADDRESS
+from utils import Screen, get_ranking, play_music
+from assets import ASSETS
+from game_utils import GameCore
+from scheduler import AdaptiveScheduler
+from leaderboard import get_client
+from profiler import PROFILER
+
+# Answers of every game of a session, per difficulty (keyed by is_easy), pick the next questions
+SCHEDULERS = {True: AdaptiveScheduler(is_easy=True), False: AdaptiveScheduler(is_easy=False)}
+
+
+def pause_gc(mode):
+    '''
+    Keeps the cyclic garbage collector from pausing the game while it is played.
+
+    Args:
+        mode (string): 'freeze' to leave every object existing so far out of its
+            collections, 'disable' to stop it, None to leave it running as usual
+    '''
+    if mode == 'freeze':
+        gc.collect()
+        gc.freeze()
+    elif mode == 'disable':
+        gc.disable()
+
+
+def resume_gc(mode):
+    '''Lets the garbage collector run as usual again, after pause_gc was called with the same mode'''
+    if mode == 'freeze':
+        gc.unfreeze()
+    elif mode == 'disable':
+        gc.enable()
+        gc.collect()
 
 
 class Game(Screen):
     '''
     Defines the game screen. Inherits screen methods from a parent
     class. Every frame of this screen is generated by running the
-    function render_frame once.
+    function render_frame once. The game itself is simulated in fixed
+    steps of game time, independently of how often frames are rendered.
     '''
 
-    def __init__(self, name='', is_easy=False):
+    def __init__(self, name='', is_easy=False, dirty_rects=GAME_CONSTANTS['DIRTY_RECTS'], rendering=True, pool_size=None):
         '''
         Initializes parent class attributes, stops menu music from
         playing and plays game music, instanciates all objects that
-        will appear on the game screen.
+        will appear on the game screen through the game core.
 
         Args:
             name (string): name of the player, optional
             is_easy (bool): difficulty of the game, defaults to hard (is_easy=False)
+            dirty_rects (bool): whether only changed regions are redrawn each frame
+            rendering (bool): whether frames are drawn, or the game is only simulated
+            pool_size (int): capacity of the pools of entities, defaults to the constants'
         '''
         super().__init__(name)
 
-        pygame.mixer.music.stop()
-        pygame.mixer.music.load('music/game_soundtrack.wav')
-        pygame.mixer.music.play(-1)
+        play_music(MUSIC_CONSTANTS['GAME'])
+
+        self.gate_image = ASSETS.get(GAME_CONSTANTS['GATE_IMAGE'])
+
+        scheduler = SCHEDULERS[is_easy] if GAME_CONSTANTS['ADAPTIVE_QUESTIONS'] else None
+
+        self.core = GameCore(is_easy, on_game_over=self.on_game_over, scheduler=scheduler, pool_size=pool_size)
+
+        # Entities of the game drawn by this screen
+        self.meditating_ninja = self.core.meditating_ninja
+        self.panel = self.core.panel
+        self.shuriken_controller = self.core.shuriken_controller
+        self.enemy_ninja_controller = self.core.enemy_ninja_controller
+
+        self.dirty_rects = dirty_rects
+        self.rendering = rendering
 
-        self.gate_image = GAME_CONSTANTS['GATE_IMAGE']
+        self.bake_background()
 
-        self.meditating_ninja = MeditatingNinja()
+        # Game time not simulated yet, carried over between frames
+        self.step = GAME_CONSTANTS['SIMULATION_STEP']
+        self.accumulator = 0
+        self.last_frame_time = time.perf_counter()
 
-        self.panel = Panel(is_easy)
+        # Rects touched by shurikens and enemies in the previous frame
+        self.sprite_rects = []
+        self.needs_full_redraw = True
 
-        self.shuriken_controller = ShurikenController(self.panel)
+        # Set when the game over sequence starts
+        self.game_over_time = None
+        self.score_saver = None
 
-        # Spawn time between enemies vary with difficulty
-        spawn_interval = 5000 if is_easy else 1500
-        self.enemy_ninja_controller = EnemyNinjaController(spawn_interval)
+        # Entities come from pools, so the game itself leaves little garbage to collect
+        self.gc_mode = GAME_CONSTANTS['GC_MODE']
+        pause_gc(self.gc_mode)
 
-        self.collision_controller = CollisionController(
-            self.meditating_ninja, self.shuriken_controller, self.enemy_ninja_controller, self.panel, self.on_game_over
-        )
+    def static_content(self):
+        '''Returns: the meditating ninja and the gate in front of him with their positions'''
+        return [
+            (self.meditating_ninja.shape, self.meditating_ninja.position),
+            (self.gate_image, [105, 105]),
+        ]
 
     def on_game_over(self):
         '''
-        Saves the user's score to the high scores textfile,
-        sets up a redirection to the menu, stops the screen 
-        from running, and changes to the menu's music
+        Starts the game over sequence: stops the game music, plays
+        a sound effect, and saves the user's score in a background
+        thread. The scene stays frozen on screen, while input keeps
+        being processed, until update_game_over ends the sequence.
+        The garbage collector runs as usual again from then on.
         '''
-        ranking = Ranking('high_scores.txt')
+        resume_gc(self.gc_mode)
+
+        pygame.mixer.music.stop()
+        pygame.mixer.Sound.play(GAME_CONSTANTS['GONG_SOUND'])
+
+        self.game_over_time = time.perf_counter()
+
+        self.score_saver = threading.Thread(target=self.save_score)
+        self.score_saver.start()
+
+    def save_score(self):
+        '''
+        Saves the user's score to the leaderboard server if there is one,
+        to the high scores textfile otherwise, or if the server did not
+        save it in time
+        '''
+        if LEADERBOARD_ADDRESS:
+            try:
+                response = get_client(LEADERBOARD_ADDRESS).submit(self.name, self.panel.score).result(
+                    timeout=GAME_CONSTANTS['SAVE_TIMEOUT']
+                )
+            except Exception:  # Timed out, or the client failed to answer even from its own fallback
+                response = {'ok': False}
+
+            if response['ok']:
+                return
+
+        ranking = get_ranking('high_scores.txt')
         ranking.new_record(self.name, self.panel.score)
 
+    def update_game_over(self):
+        '''
+        Ends the game over sequence once the scene was frozen for long
+        enough and the score is saved: sets up a redirection to the menu,
+        stops the screen from running, and changes to the menu's music
+        '''
+        if time.perf_counter() - self.game_over_time < GAME_CONSTANTS['GAME_OVER_TIME']:
+            return
+
+        if self.score_saver.is_alive():
+            return
+
         self.set_next_screen(SCREEN_NAMES[0])
 
         self.stop_running()
 
-        pygame.mixer.music.stop()
-        pygame.mixer.music.load('music/music_calm.wav')
-        pygame.mixer.music.play(-1)
+        play_music(MUSIC_CONSTANTS['MENU'])
 
     def render_frame(self):
-        '''Renders one frame of the game on a pygame display'''
+        '''
+        Processes input, advances the simulation by as many fixed steps
+        as the real time elapsed since the previous frame allows, and
+        renders one frame of the game on a pygame display. After a game
+        over the simulation stops and the frozen scene keeps being shown.
+        F3 shows or hides the frame profiler's overlay.
+        '''
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if not self.core.over:
+                    resume_gc(self.gc_mode)
+
                 self.stop_running()
 
-            if event.type == pygame.USEREVENT:
-                self.enemy_ninja_controller.spawn_enemy_ninjas()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                PROFILER.toggle_overlay()
+                self.needs_full_redraw = True
 
-            if event.type == pygame.KEYDOWN:
+            elif event.type == pygame.KEYDOWN and not self.core.over:
                 self.panel.process_keyboard(event.key)
                 self.shuriken_controller.process_keyboard(event.key)
 
-        self.screen.fill([255, 255, 255])
+        PROFILER.mark('events')
+
+        now = time.perf_counter()
+        elapsed = min(now - self.last_frame_time, GAME_CONSTANTS['MAX_FRAME_TIME'])
+        self.last_frame_time = now
+
+        if self.core.over:
+            self.update_game_over()
+        else:
+            self.accumulator += elapsed
+
+        while self.accumulator >= self.step and not self.core.over:
+            self.update(self.step)
+            self.accumulator -= self.step
+
+        if not self.rendering:
+            return
+
+        # How far between the last simulation step and the next one this frame is
+        alpha = min(self.accumulator / self.step, 1)
+
+        if PROFILER.enabled:
+            PROFILER.set_entity_count(
+                self.shuriken_controller.get_live_count() + self.enemy_ninja_controller.get_live_count()
+            )
+            PROFILER.set_pool_stats(self.core.get_pool_stats())
+
+        if self.dirty_rects and not self.needs_full_redraw:
+            rects = self.draw_dirty(alpha)
+
+            if PROFILER.overlay:  # Erased along with the sprites in the next frame
+                overlay_rect = PROFILER.render_overlay(self.screen)
+                self.sprite_rects.append(overlay_rect)
+                rects.append(overlay_rect)
+                PROFILER.mark('overlay')
+
+            pygame.display.update(rects)
+        else:
+            self.draw_full(alpha)
+
+            if PROFILER.overlay:
+                self.sprite_rects.append(PROFILER.render_overlay(self.screen))
+                PROFILER.mark('overlay')
+
+            pygame.display.update()
+
+        PROFILER.mark('display_update')
+
+    def update(self, dt):
+        '''Advances the game by one simulation step of dt seconds'''
+        self.core.update(dt)
 
-        self.meditating_ninja.render(self.screen)
+    def draw_full(self, alpha=1):
+        '''
+        Redraws the whole game screen.
 
-        self.screen.blit(self.gate_image, [105, 105])
+        Args:
+            alpha (float): fraction of a simulation step elapsed since the latest step
+        '''
+        self.render_background()
+        PROFILER.mark('background')
 
         self.panel.render(self.screen)
+        PROFILER.mark('panel_render')
+
+        self.sprite_rects = self.shuriken_controller.render(self.screen, alpha)
+        PROFILER.mark('shuriken_render')
+
+        self.sprite_rects += self.enemy_ninja_controller.render(self.screen, alpha)
+        PROFILER.mark('enemy_render')
+
+        self.needs_full_redraw = False
+
+    def draw_dirty(self, alpha=1):
+        '''
+        Redraws only the regions of the screen that changed since the
+        previous frame: the background is restored where shurikens and
+        enemies were, changed panel areas are redrawn, and the moving
+        entities are drawn at their new positions.
+
+        Args:
+            alpha (float): fraction of a simulation step elapsed since the latest step
+
+        Returns: list of rects that have to be pushed to the display
+        '''
+        erased_rects = self.sprite_rects
+
+        self.screen.blits([(self.background, rect, rect) for rect in erased_rects], doreturn=False)
+
+        PROFILER.mark('background')
 
-        self.shuriken_controller.render(self.screen)
+        panel_rects = self.panel.render_dirty(self.screen, self.background)
+        PROFILER.mark('panel_render')
 
-        self.enemy_ninja_controller.render(self.screen)
+        self.sprite_rects = self.shuriken_controller.render(self.screen, alpha)
+        PROFILER.mark('shuriken_render')
 
-        self.collision_controller.scan_for_collisions()
+        self.sprite_rects += self.enemy_ninja_controller.render(self.screen, alpha)
+        PROFILER.mark('enemy_render')
 
-        pygame.display.update()
+        return erased_rects + panel_rects + self.sprite_rects
 
 
 class HardGame(Game):
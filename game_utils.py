@@ -1,63 +1,95 @@
 import pygame
+import array
+import itertools
 import math
+import operator
 import random
-import time
+from collections import deque, namedtuple
 from constants import INTERMEDIATE_FONT, GAME_CONSTANTS
-from utils import render_font
+from utils import render_font, GlyphAtlas
+from assets import ASSETS
+from profiler import PROFILER
 
+# Digits of the numbers shown on the panel, rendered once and shared by every game
+DIGITS = GlyphAtlas(INTERMEDIATE_FONT)
 
-class Question:
-    '''
-    Defines a math question object. The question is random and can be updated in the same object.
-    '''
 
-    def __init__(self, is_easy):
-        '''
-        Initializes two numbers at random, picks up an operation,
-        stores the result, and stores the operation symbol string.
+# A math question: its numbers, operation symbol, answer and how it is shown
+Fact = namedtuple('Fact', ['A', 'operation_symbol', 'B', 'answer', 'string'])
 
-        Args:
-            is_easy (bool): whether the game difficulty is easy or not
-        '''
 
-        self.is_easy = is_easy
+def build_question_bank(is_easy):
+    '''
+    Lists every question of a difficulty. The easy game only has times
+    tables (0-9 x 1-9); the hard game has additions, subtractions,
+    multiplications and exact divisions of numbers from 0-12 by 1-12.
 
-        if self.is_easy:  # If the game is easy only times tables allowed
-            self.A = random.randint(0, 9)
-            self.B = random.randint(1, 9)
+    Args:
+        is_easy (bool): whether the game difficulty is easy or not
 
-            self.__operation = lambda a, b: (a * b, 'x')
+    Returns:
+        tuple: one tuple of Facts per operation
+    '''
+    if is_easy:
+        operations = [('x', operator.mul)]
+        numbers_A, numbers_B = range(0, 10), range(1, 10)
+    else:
+        operations = [('+', operator.add), ('-', operator.sub), ('x', operator.mul), ('/', operator.floordiv)]
+        numbers_A, numbers_B = range(0, 13), range(1, 13)
+
+    return tuple(
+        tuple(
+            Fact(A, symbol, B, operation(A, B), f'{A} {symbol} {B} =')
+            for A in numbers_A for B in numbers_B
+            if symbol != '/' or A % B == 0
+        )
+        for symbol, operation in operations
+    )
 
-        else:  # Hard game should have all operations and bigger numbers
-            self.A = random.randint(0, 12)
-            self.B = random.randint(1, 12)
 
-            # Randomly selects a function which will return the answer and operation symbol
-            self.__operation = random.choice([
-                lambda a, b: (a + b, '+'),
-                lambda a, b: (a - b, '-'),
-                lambda a, b: (a * b, 'x'),
-                lambda a, b: (a / b, '/')
-            ])
+# Every question of each difficulty (keyed by is_easy), built once
+QUESTION_BANK = {True: build_question_bank(True), False: build_question_bank(False)}
 
-        self.answer, self.operation_symbol = self.__operation(self.A, self.B)
+# Text of each question, rendered the first time it is asked
+QUESTION_TEXTS = {}
 
-        self.prevent_non_exact_division()
 
-    def prevent_non_exact_division(self):
-        '''Keeps picking new numbers if a division is not exact and updates attributes'''
-        if self.operation_symbol != '/':
-            return
+class Question:
+    '''
+    Defines a math question object. The question is random and can be updated in the same object.
+    '''
+
+    def __init__(self, is_easy, rng=random, scheduler=None):
+        '''
+        Picks a random question of the given difficulty, storing its
+        two numbers, the operation symbol string and the result.
 
-        while (self.A % self.B != 0):
-            self.A = random.randint(0, 12)
-            self.B = random.randint(1, 12)
+        Args:
+            is_easy (bool): whether the game difficulty is easy or not
+            rng (random.Random): source of random numbers, defaults to the random module
+            scheduler (AdaptiveScheduler): picks the questions the player needs to practice, optional
+        '''
+        self.is_easy = is_easy
+        self.rng = rng
+        self.scheduler = scheduler
 
-        self.answer, _ = self.__operation(self.A, self.B)
+        self.new_question()
 
     def new_question(self):
-        '''Re-runs the constructor to get a new random question'''
-        self.__init__(is_easy=self.is_easy)
+        '''
+        Picks a new random question from the question bank. Every
+        operation is equally likely, and so is every question of it,
+        unless a scheduler weights them by the player's answers.
+        '''
+        if self.scheduler:
+            self.set_fact(self.scheduler.pick(self.rng))
+        else:
+            self.set_fact(self.rng.choice(self.rng.choice(QUESTION_BANK[self.is_easy])))
+
+    def set_fact(self, fact):
+        '''Makes a given Fact of the question bank the current question'''
+        self.fact = fact
+        self.A, self.operation_symbol, self.B, self.answer = fact.A, fact.operation_symbol, fact.B, fact.answer
 
     def try_answer(self, answer):
         '''
@@ -72,7 +104,14 @@ class Question:
 
     def get_string(self):
         '''Returns: string representation of the math question'''
-        return f'{self.A} {self.operation_symbol} {self.B} ='
+        return self.fact.string
+
+    def get_text(self):
+        '''Returns: the math question rendered, reusing the text rendered the last time it was asked'''
+        if self.fact not in QUESTION_TEXTS:
+            QUESTION_TEXTS[self.fact] = render_font(self.fact.string, font=INTERMEDIATE_FONT)
+
+        return QUESTION_TEXTS[self.fact]
 
 
 class MeditatingNinja:
@@ -80,159 +119,388 @@ class MeditatingNinja:
 
     def __init__(self):
         '''Initializes the ninja's image, size, and positions on screen'''
-        self.shape = GAME_CONSTANTS['NINJA_IMAGE']
+        self.shape = ASSETS.get(GAME_CONSTANTS['NINJA_IMAGE'])
 
         self.size = GAME_CONSTANTS['NINJA_SIZE']
 
         self.position = GAME_CONSTANTS['NINJA_POSITION']
 
     def render(self, display):
-        '''Renders the meditating ninja on a given pygame display'''
-        display.blit(self.shape, self.position)
+        '''Renders the meditating ninja on a given pygame display, returns the rect touched'''
+        return display.blit(self.shape, self.position)
 
 
-class Shuriken:
-    '''Defines a shuriken which will appear in the game'''
+# Sides of the screen, in the order entities store them
+SIDES = ['RIGHT', 'LEFT']
+SIDE_INDEXES = {'RIGHT': 0, 'LEFT': 1}
 
-    def __init__(self, direction):
-        '''
-        Initializes shuriken direction, image, size, speed, and position depending on direction
 
+class EntityStore:
+    '''
+    Defines a fixed-capacity pool of entities of one kind (e.g. every
+    shuriken), stored as a struct of arrays: each field is a typed array,
+    and an entity is the slot it takes in all of them. Entities move
+    along a single row, so only their x positions change. A simulation
+    step moves the entities on screen in place, and the entities are
+    drawn with a single call of Surface.blits. Every slot is allocated
+    up front and entities acquire and release them, so nothing is
+    allocated or left to the garbage collector while the game runs. The
+    store keeps no record of which slots are live: the lanes of its
+    controller hold them, and every pass goes over the lanes. The arrays
+    are only ever changed in place, so references to them stay valid.
+    '''
+
+    def __init__(self, size, positions, load_images, capacity):
+        '''
         Args:
-            direction (string): direction to which the shuriken will move, must be: "RIGHT" or "LEFT"
+            size (list): width and height of every entity
+            positions (tuple): starting [x, y] position of the entities of each side, ordered as SIDES
+            load_images (function): returns the image of the entities of each side, ordered as SIDES,
+                called the first time entities are drawn so simulations need no images
+            capacity (int): number of entities that may be on screen at once
         '''
-        self.direction = direction
+        self.width = size[0]
+        self.start_x = [position[0] for position in positions]
+        self.y = [position[1] for position in positions]
 
-        self.shape = GAME_CONSTANTS['SHURIKEN_IMAGE']
+        self.load_images = load_images
+        self.images = None
 
-        self.size = GAME_CONSTANTS['SHURIKEN_SIZE']
+        self.capacity = capacity
 
-        self.speed = GAME_CONSTANTS['SHURIKEN_SPEED']
+        # Fields of the entities, indexed by slot
+        self.x = array.array('d', bytes(8 * capacity))
+        self.previous_x = array.array('d', bytes(8 * capacity))  # x at the previous simulation step
+        self.velocity = array.array('d', bytes(8 * capacity))  # pixels per second, negative when moving to the left
+        self.sides = array.array('b', bytes(capacity))  # index in SIDES of the side the entity belongs to
+        self.serials = array.array('Q', bytes(8 * capacity))  # how many entities were acquired before it
+        self.used = bytearray(capacity)  # whether the slot was ever taken
 
-        init_position = GAME_CONSTANTS['SHURIKEN_POSITION']
-        self.position = init_position[0] if direction == 'RIGHT' else init_position[1]
+        # [image, [x, y]] of each slot, updated in place and passed to Surface.blits
+        self.blit_items = [[None, [0, 0]] for _ in range(capacity)]
 
-    def render(self, display):
-        '''Renders the shuriken on a given pygame display'''
-        display.blit(self.shape, self.position)
+        # Free slots, the lowest ones taken first
+        self.free_slots = list(reversed(range(capacity)))
 
-    def update_position(self):
+        # Counters: entities acquired, acquisitions which reused a released slot (an allocation
+        # avoided), and acquisitions refused because every slot was taken
+        self.acquired = 0
+        self.reused = 0
+        self.exhausted = 0
+
+    def acquire(self, side, direction, speed):
         '''
-        In each frame the shuriken will move its speed in pixels to its direction.
-        Adding to the x-coordinate means going to the right of the screen.
-        Subtracting from the x-coordinate means going to the left of the screen.
+        Takes a free slot for a new entity, placed at the starting position of a side.
+
+        Args:
+            side (string): side the entity belongs to, "RIGHT" or "LEFT"
+            direction (int): 1 if the entity moves to the right, -1 if it moves to the left
+            speed (float): speed of the entity in pixels per second
+
+        Returns:
+            int: slot of the entity, None if every slot is taken
         '''
-        if self.direction == 'RIGHT':
-            self.position = self.position[0] + self.speed, self.position[1]
+        if not self.free_slots:
+            self.exhausted += 1
+            return None
+
+        slot = self.free_slots.pop()
+        side_index = SIDE_INDEXES[side]
+
+        self.x[slot] = self.previous_x[slot] = self.start_x[side_index]
+        self.velocity[slot] = direction * speed
+        self.sides[slot] = side_index
+
+        if self.used[slot]:  # A slot released before, where a new object would have been allocated
+            self.reused += 1
+
+        self.used[slot] = 1
+
+        self.serials[slot] = self.acquired
+
+        item = self.blit_items[slot]
+        item[0] = self.images[side_index] if self.images else None
+        item[1][1] = self.y[side_index]
+
+        self.acquired += 1
+
+        return slot
 
-        if self.direction == 'LEFT':
-            self.position = self.position[0] - self.speed, self.position[1]
+    def release(self, slot):
+        '''Returns the slot of an entity removed from the screen to the pool'''
+        self.free_slots.append(slot)
 
+    def get_stats(self):
+        '''Returns: dictionary with the capacity, entities live, acquired, reused slots and refused acquisitions'''
+        return {
+            'capacity': self.capacity,
+            'live': self.capacity - len(self.free_slots),
+            'acquired': self.acquired,
+            'reused': self.reused,
+            'exhausted': self.exhausted,
+        }
 
-class EnemyNinja:
-    '''Defines an enemy ninja which will appear in the game'''
+    def place(self, slot, x):
+        '''Moves an entity to a given x position, without it having moved in between'''
+        self.x[slot] = self.previous_x[slot] = x
 
-    def __init__(self, side):
+    def get_side(self, slot):
+        '''Returns: side ("RIGHT" or "LEFT") the entity in a slot belongs to'''
+        return SIDES[self.sides[slot]]
+
+    def step(self, dt, slots):
         '''
-        Initializes the ninja's side (where he comes from on the screen), shape
-        (images that varies depending on the side), size, speed, position (varies
-        depending on the side).
+        Moves entities by their velocity times dt seconds, updating the
+        arrays in place so a step allocates nothing.
 
         Args:
-            side (string): side which the enemy ninjas comes from, must be: "RIGHT" or "LEFT"
+            dt (float): seconds of the simulation step
+            slots (iterable): slots of the entities on screen, free slots are left alone
         '''
-        self.side = side
+        x, previous_x, velocity = self.x, self.previous_x, self.velocity
 
-        if side == 'RIGHT':
-            self.shape = GAME_CONSTANTS['ENEMY_NINJA_IMAGE'][0].convert_alpha()
-        else:
-            self.shape = GAME_CONSTANTS['ENEMY_NINJA_IMAGE'][1].convert_alpha()
+        for slot in slots:
+            previous_x[slot] = x[slot]
+            x[slot] += velocity[slot] * dt
 
-        self.size = GAME_CONSTANTS['ENEMY_NINJA_SIZE']
+    def has_left_playfield(self, slot):
+        '''Returns: whether an entity moved past the edge of the playfield it is moving towards'''
+        if self.velocity[slot] > 0:
+            return self.x[slot] >= GAME_CONSTANTS['PLAYFIELD_WIDTH']
 
-        self.speed = GAME_CONSTANTS['ENEMY_NINJA_SPEED']
+        return self.x[slot] + self.width <= 0
 
-        init_position = GAME_CONSTANTS['ENEMY_NINJA_POSITION']
-        self.position = init_position[0] if side == 'RIGHT' else init_position[1]
+    def is_on_screen(self, slot):
+        '''Returns: whether any part of an entity is within the playfield'''
+        return self.x[slot] < GAME_CONSTANTS['PLAYFIELD_WIDTH'] and self.x[slot] + self.width > 0
 
-    def render(self, display):
-        '''Renders an enemy ninjas on a given pygame display'''
-        display.blit(self.shape, self.position)
+    def get_blit_sequence(self, slots, alpha=1):
+        '''
+        Lays out entities interpolated between their last two simulation
+        steps. Only the blit items are updated, the entities do not move.
+
+        Args:
+            slots (iterable): slots of the entities, in drawing order
+            alpha (float): fraction of a simulation step elapsed since the latest step
 
-    def update_position(self):
+        Returns:
+            list: [image, [x, y]] of each entity, to be passed to Surface.blits
         '''
-        In each frame the enemy ninja will move its speed in pixels towards 
-        the center of the screen.
-        Adding to the x-coordinate means going to the right direction.
-        Subtracting from the x-coordinate means going to the left direction.
+        if self.images is None:
+            self.images = self.load_images()
+
+            for slot, item in enumerate(self.blit_items):
+                item[0] = self.images[self.sides[slot]]
+
+        x, previous_x, blit_items = self.x, self.previous_x, self.blit_items
+        sequence = []
+
+        for slot in slots:
+            item = blit_items[slot]
+            item[1][0] = round(previous_x[slot] + (x[slot] - previous_x[slot]) * alpha)
+            sequence.append(item)
+
+        return sequence
+
+    def render(self, display, slots, alpha=1):
         '''
-        if self.side == 'RIGHT':
-            self.position = self.position[0] - self.speed, self.position[1]
+        Draws entities on a given display with a single call of Surface.blits.
 
-        if self.side == 'LEFT':
-            self.position = self.position[0] + self.speed, self.position[1]
+        Args:
+            display (pygame.Surface): surface to draw the entities on
+            slots (iterable): slots of the entities, in drawing order
+            alpha (float): fraction of a simulation step elapsed since the latest step
+
+        Returns: list of rects touched by the entities
+        '''
+        return display.blits(self.get_blit_sequence(slots, alpha))
 
 
 class Panel:
     '''
     Defines the panel shown on the top of the game screen.
     It mainly deals with displaying information for the user.
+    Texts are only rendered when the panel is drawn, so the
+    panel also works in headless simulations.
     '''
 
-    def __init__(self, is_easy):
+    def __init__(self, is_easy, rng=random, scheduler=None, clock=None):
         '''
         Initializes all attributes which will be shown on screen:
-        math question , player score, shuriken count.
+        math question , player score, shuriken count and its image.
+
+        Args:
+            is_easy (bool): whether the game difficulty is easy or not
+            rng (random.Random): source of random numbers for the math questions
+            scheduler (AdaptiveScheduler): records answers and picks the questions, optional
+            clock (function): returns the current time in seconds, to time answers
         '''
         self.is_easy = is_easy
 
-        self.math_question = Question(is_easy)
+        self.scheduler = scheduler
+        self.clock = clock
 
-        self.math_question_text = render_font(
-            self.math_question.get_string(), font=INTERMEDIATE_FONT
-        )
+        self.math_question = Question(is_easy, rng, scheduler)
+        self.question_time = clock() if clock else 0  # When the current question was shown
 
         self.keyboard_input = ''
 
-        self.keyboard_input_text = render_font(
-            self.keyboard_input, font=INTERMEDIATE_FONT
-        )
-
         self.text_box = pygame.Surface([100, 40])
         self.text_box.fill([200, 200, 200])
 
-        self.score = 75
+        self.shuriken_image = ASSETS.get(GAME_CONSTANTS['PANEL_SHURIKEN_IMAGE'])
 
-        self.score_text = render_font(
-            f'Ninja IQ: {self.score}', font=INTERMEDIATE_FONT
-        )
+        self.score = 75
 
         self.shuriken_count = 0
 
-        self.shuriken_count_text = render_font(
-            str(self.shuriken_count), font=INTERMEDIATE_FONT
-        )
+        # Numbers drawn glyph by glyph instead of rendered as texts
+        self.digits = DIGITS if GAME_CONSTANTS['GLYPH_ATLAS'] else None
+
+        # Maps each area of the panel to the method laying it out, in drawing order
+        self.area_layouts = {
+            'math_question': self.layout_math_question,
+            'keyboard_input': self.layout_keyboard_input,
+            'score': self.layout_score,
+            'shuriken_count': self.layout_shuriken_count,
+        }
+
+        # Rects last drawn by each area, areas that need redrawing,
+        # and areas whose texts need re-rendering before being drawn
+        self.area_rects = {}
+        self.dirty_areas = set(self.area_layouts)
+        self.stale_areas = set(self.area_layouts)
+
+    def mark_changed(self, *areas):
+        '''Flags panel areas whose content changed, to be re-rendered and redrawn'''
+        self.dirty_areas.update(areas)
+        self.stale_areas.update(areas)
+
+    def update_texts(self, area):
+        '''Re-renders the text surfaces shown in a given area of the panel'''
+        if area == 'math_question':
+            self.math_question_text = self.math_question.get_text()
+
+        if area == 'keyboard_input':
+            self.keyboard_input_text = render_font(
+                self.keyboard_input, font=INTERMEDIATE_FONT
+            )
+
+        if area == 'score':
+            self.score_text = render_font(
+                'Ninja IQ: ' if self.digits else f'Ninja IQ: {self.score}', font=INTERMEDIATE_FONT
+            )
+
+        if area == 'shuriken_count' and not self.digits:
+            self.shuriken_count_text = render_font(
+                str(self.shuriken_count), font=INTERMEDIATE_FONT
+            )
+
+        self.stale_areas.discard(area)
 
     def render(self, display):
-        '''Renders the whole panel on a given display'''
-        self.render_math_question(display)
-        self.render_score(display)
-        self.render_shuriken_count(display)
-
-    def render_math_question(self, display):
-        '''Renders the math question on a given display'''
-        display.blit(self.math_question_text, [10, 10])
-        display.blit(self.text_box, [10, 40])
-        display.blit(self.keyboard_input_text, [13, 43])
-
-    def render_score(self, display):
-        '''Renders the score on a given display'''
-        display.blit(self.score_text, [225, 20])
-
-    def render_shuriken_count(self, display):
-        '''Renders the shuriken count on a given display'''
-        display.blit(GAME_CONSTANTS['PANEL_SHURIKEN_IMAGE'], [470, 15])
-        display.blit(self.shuriken_count_text, [510, 20])
+        '''Renders the whole panel on a given display, returns the rects touched'''
+        rects = self.render_areas(self.area_layouts, display)
+
+        self.dirty_areas.clear()
+
+        return rects
+
+    def render_dirty(self, display, background):
+        '''
+        Renders only the panel areas which changed since they were last
+        drawn. The background is restored under the old contents of each
+        area first, so shorter texts do not leave stale pixels behind.
+
+        Args:
+            display (pygame.Surface): surface to render the panel on
+            background (pygame.Surface): static background of the screen
+
+        Returns:
+            list: rects touched, both the erased and the newly drawn ones
+        '''
+        dirty_areas = self.dirty_areas
+
+        # Areas overlapping an erased one (e.g. a long typed answer running
+        # under the score) have to be erased and redrawn as well
+        while True:
+            erased_rects = [rect for area in dirty_areas for rect in self.area_rects.get(area, [])]
+
+            overlapping_areas = set(
+                area for area, rects in self.area_rects.items()
+                if area not in dirty_areas and any(rect.collidelist(erased_rects) != -1 for rect in rects)
+            )
+
+            if not overlapping_areas:
+                break
+
+            dirty_areas = dirty_areas | overlapping_areas
+
+        display.blits([(background, rect, rect) for rect in erased_rects], doreturn=False)
+
+        # Keeps the drawing order of render
+        rects = erased_rects + self.render_areas([area for area in self.area_layouts if area in dirty_areas], display)
+
+        self.dirty_areas.clear()
+
+        return rects
+
+    def render_areas(self, areas, display):
+        '''
+        Renders panel areas with a single call of Surface.blits, and
+        remembers the rects each of them touched.
+
+        Args:
+            areas (iterable): areas to render, in drawing order
+            display (pygame.Surface): surface to render the areas on
+
+        Returns:
+            list: rects touched
+        '''
+        sequences = []
+
+        for area in areas:
+            if area in self.stale_areas:
+                self.update_texts(area)
+
+            sequences.append((area, self.area_layouts[area]()))
+
+        rects = display.blits([item for _, sequence in sequences for item in sequence])
+
+        start = 0
+
+        for area, sequence in sequences:
+            self.area_rects[area] = rects[start:start + len(sequence)]
+            start += len(sequence)
+
+        return rects
+
+    def layout_math_question(self):
+        '''Returns: (surface, position) of the math question'''
+        return [(self.math_question_text, [10, 10])]
+
+    def layout_keyboard_input(self):
+        '''Returns: (surface, position) of the text box and of the answer being typed'''
+        return [
+            (self.text_box, [10, 40]),
+            (self.keyboard_input_text, [13, 43]),
+        ]
+
+    def layout_score(self):
+        '''Returns: (surface, position) of the score label and of the score'''
+        if self.digits:
+            label_right = 225 + self.score_text.get_width()
+
+            return [(self.score_text, [225, 20])] + self.digits.get_blit_sequence(str(self.score), [label_right, 20])
+
+        return [(self.score_text, [225, 20])]
+
+    def layout_shuriken_count(self):
+        '''Returns: (surface, position) of the shuriken image and of the shuriken count'''
+        if self.digits:
+            return [(self.shuriken_image, [470, 15])] + self.digits.get_blit_sequence(str(self.shuriken_count), [510, 20])
+
+        return [(self.shuriken_image, [470, 15]), (self.shuriken_count_text, [510, 20])]
 
     def add_score(self):
         '''Updates player score depending on game difficulty'''
@@ -241,20 +509,46 @@ class Panel:
         else:
             self.score += 10
 
-        self.score_text = render_font(
-            f'Ninja IQ: {self.score}', font=INTERMEDIATE_FONT
-        )
+        self.mark_changed('score')
 
     def spend_shuriken(self):
         '''Updates shuriken count when player throws a shuriken'''
         self.shuriken_count -= 1
 
-        self.shuriken_count_text = render_font(
-            str(self.shuriken_count), font=INTERMEDIATE_FONT
-        )
+        self.mark_changed('shuriken_count')
+
+    def submit_answer(self, answer):
+        '''
+        Answers the math question. A right answer earns a shuriken
+        and replaces the question with a new one.
+
+        Args:
+            answer (string): answer typed by the player
+
+        Returns: boolean representing if the answer is right or not
+        '''
+        is_right = self.math_question.try_answer(answer)
+
+        if self.scheduler and self.clock:
+            self.scheduler.record(self.math_question.fact, is_right, self.clock() - self.question_time)
+
+        if not is_right:
+            return False
+
+        self.shuriken_count += 1
+        self.math_question.new_question()
+
+        if self.clock:
+            self.question_time = self.clock()
+
+        self.mark_changed('math_question', 'shuriken_count')
+
+        return True
 
     def process_keyboard(self, key):
         '''Processed keyboard input (player typing answer)'''
+        previous_input = self.keyboard_input
+
         key_pressed = pygame.key.name(key)
 
         if key_pressed in '0123456789':
@@ -269,96 +563,211 @@ class Panel:
                 if len(self.keyboard_input) <= 0 or self.keyboard_input == '-':
                     return
 
-                if self.math_question.try_answer(self.keyboard_input):
-                    self.shuriken_count += 1
-                    self.math_question.new_question()
+                self.submit_answer(self.keyboard_input)
 
                 self.keyboard_input = ''
 
             if key == pygame.K_BACKSPACE:
                 self.keyboard_input = self.keyboard_input[:-1]
 
-        self.math_question_text = render_font(
-            self.math_question.get_string(), font=INTERMEDIATE_FONT
-        )
-        self.keyboard_input_text = render_font(
-            self.keyboard_input, font=INTERMEDIATE_FONT
-        )
-        self.shuriken_count_text = render_font(
-            str(self.shuriken_count), font=INTERMEDIATE_FONT
-        )
+        if self.keyboard_input != previous_input:
+            self.mark_changed('keyboard_input')
+
+
+class EntityController:
+    '''
+    Defines the lanes and lifecycle shared by the controllers of the
+    entities moving on screen: a pool of entities, one lane per side
+    with the slots of its entities in order from the frontmost (oldest)
+    to the newest, and a count of entities retired from them. All
+    entities of a lane move at the same speed, so the lanes stay ordered.
+    '''
+
+    def __init__(self, store):
+        '''
+        Args:
+            store (EntityStore): pool of the entities
+        '''
+        self.store = store
+
+        self.lanes = {'RIGHT': deque(), 'LEFT': deque()}
+        self.retired_count = 0
+
+    def add(self, side, direction, speed):
+        '''
+        Adds a new entity of a side ("RIGHT" or "LEFT") behind its lane.
+
+        Args:
+            side (string): side the entity belongs to, and lane it joins
+            direction (int): 1 if the entity moves to the right, -1 if it moves to the left
+            speed (float): speed of the entity in pixels per second
+
+        Returns: slot of the entity, None if the pool is exhausted
+        '''
+        entity = self.store.acquire(side, direction, speed)
+
+        if entity is not None:
+            self.lanes[side].append(entity)
+
+        return entity
+
+    def update(self, dt):
+        '''Moves every entity by one simulation step of dt seconds, and retires those which left the playfield'''
+        self.store.step(dt, itertools.chain(*self.lanes.values()))
+
+        self.cull()
+
+    def render(self, display, alpha=1):
+        '''
+        Renders every entity on a given display.
+
+        Args:
+            display (pygame.Surface): surface to render the entities on
+            alpha (float): fraction of a simulation step elapsed since the latest step
+
+        Returns: list of rects touched by the entities
+        '''
+        return self.store.render(display, itertools.chain(*self.lanes.values()), alpha)
+
+    def cull(self):
+        '''Retires every entity which left the playfield, frontmost ones first'''
+        for lane in self.lanes.values():
+            while lane and self.store.has_left_playfield(lane[0]):
+                self.store.release(lane.popleft())
+                self.retired_count += 1
+
+    def retire(self, entity):
+        '''Removes an entity (slot) from the screen, e.g. when a shuriken hit an enemy. Frontmost entities are removed in O(1).'''
+        lane = self.lanes[self.store.get_side(entity)]
+
+        if lane[0] == entity:
+            lane.popleft()
+        else:
+            lane.remove(entity)
 
+        self.store.release(entity)
+        self.retired_count += 1
 
-class ShurikenController:
+    def get_live_count(self):
+        '''Returns: number of entities currently on screen'''
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def get_retired_count(self):
+        '''Returns: number of entities removed from the screen so far'''
+        return self.retired_count
+
+
+class ShurikenController(EntityController):
     ''' 
     Defines a controller to deal with all shurikens appearing on screen.
     It is responsible for rendering and processing shuriken throws.
     '''
 
-    def __init__(self, panel):
+    def __init__(self, panel, speed=GAME_CONSTANTS['SHURIKEN_SPEED'], capacity=GAME_CONSTANTS['SHURIKEN_POOL_SIZE']):
         ''' 
-        Initializes an array to store all shurikens appearing
-        on screen, and a panel attribute to modify the panel which
-        appears at the top of the game screen. 
+        Initializes the pool and lanes of every shuriken on screen, one
+        lane per direction, and a panel attribute to modify the panel
+        which appears at the top of the game screen.
 
         Args:
-            panel (Panel): panel to be updated  '''
+            panel (Panel): panel to be updated
+            speed (float): speed of the shurikens in pixels per second
+            capacity (int): number of shurikens that may be on screen at once  '''
 
-        self.rendered_shurikens = []
+        super().__init__(EntityStore(
+            GAME_CONSTANTS['SHURIKEN_SIZE'], GAME_CONSTANTS['SHURIKEN_POSITION'],
+            lambda: [ASSETS.get(GAME_CONSTANTS['SHURIKEN_IMAGE'])] * len(SIDES), capacity
+        ))
 
         self.panel = panel
+        self.speed = speed
 
-    def render(self, display):
-        '''Renders every shuriken on a given display and updates their positions'''
-        for shuriken in self.rendered_shurikens:
-            shuriken.render(display)
-            shuriken.update_position()
+    def throw(self, direction):
+        '''
+        Adds a new shuriken moving to a given direction ("RIGHT" or "LEFT") behind its lane.
 
-    def process_keyboard(self, key):
-        '''Processes keystrokes in order to throw shurikens'''
-        if self.panel.shuriken_count <= 0:
-            return
+        Returns: slot of the shuriken, None if the pool is exhausted
+        '''
+        return self.add(direction, 1 if direction == 'RIGHT' else -1, self.speed)
 
-        if key == pygame.K_LEFT:
-            self.rendered_shurikens.append(Shuriken(direction='LEFT'))
-            self.panel.spend_shuriken()
+    def try_throw(self, direction):
+        '''
+        Throws a shuriken to a given direction ("RIGHT" or "LEFT") if
+        the player has any, spending it from the panel.
 
-            pygame.mixer.Sound.play(GAME_CONSTANTS['SHURIKEN_SOUND'])
+        Returns: boolean representing if a shuriken was thrown
+        '''
+        if self.panel.shuriken_count <= 0 or self.throw(direction) is None:
+            return False
 
-        if key == pygame.K_RIGHT:
-            self.rendered_shurikens.append(Shuriken(direction='RIGHT'))
-            self.panel.spend_shuriken()
+        self.panel.spend_shuriken()
 
+        return True
+
+    def process_keyboard(self, key):
+        '''Processes keystrokes in order to throw shurikens'''
+        if key == pygame.K_LEFT and self.try_throw('LEFT'):
             pygame.mixer.Sound.play(GAME_CONSTANTS['SHURIKEN_SOUND'])
 
+        if key == pygame.K_RIGHT and self.try_throw('RIGHT'):
+            pygame.mixer.Sound.play(GAME_CONSTANTS['SHURIKEN_SOUND'])
 
-class EnemyNinjaController:
+
+class EnemyNinjaController(EntityController):
     ''' 
     Defines a controller to deal with all enemy ninjas appearing on screen.
     It is responsible for rendering and spawning enemy ninjas.
     '''
 
-    def __init__(self, spawn_time):
+    def __init__(self, spawn_time, speed=GAME_CONSTANTS['ENEMY_NINJA_SPEED'], rng=random,
+                 capacity=GAME_CONSTANTS['ENEMY_NINJA_POOL_SIZE']):
         '''
-        Initializes an array to store all enemy ninjas appearing on 
-        screen. A pygame event is set to be triggered between equal
-        intervals of time in milliseconds (spawn_time). This event 
-        is handled in the main loop of the game, calling spawn_enemy_ninjas.
+        Initializes the pool and lanes of every enemy ninja on screen,
+        one lane per side. A new enemy is spawned every spawn_time
+        milliseconds of simulated game time.
+
+        Args:
+            spawn_time (float): milliseconds between two enemy spawns
+            speed (float): speed of the enemy ninjas in pixels per second
+            rng (random.Random): source of random numbers for the spawn sides
+            capacity (int): number of enemy ninjas that may be on screen at once
         '''
-        self.rendered_enemy_ninjas = []
+        super().__init__(EntityStore(
+            GAME_CONSTANTS['ENEMY_NINJA_SIZE'], GAME_CONSTANTS['ENEMY_NINJA_POSITION'],
+            lambda: [ASSETS.get(image) for image in GAME_CONSTANTS['ENEMY_NINJA_IMAGE']], capacity
+        ))
 
-        pygame.time.set_timer(pygame.USEREVENT, spawn_time)
+        self.speed = speed
+        self.rng = rng
 
-    def render(self, display):
-        '''Renders every enemy ninja on a given display and updates their positions'''
-        for enemy_ninja in self.rendered_enemy_ninjas:
-            enemy_ninja.render(display)
-            enemy_ninja.update_position()
+        self.spawn_interval = spawn_time / 1000
+        self.spawn_timer = 0
+
+    def update(self, dt):
+        '''
+        Moves every enemy ninja by one simulation step of dt seconds, retires
+        those which left the playfield, and spawns a new enemy whenever the
+        spawn interval has elapsed.
+        '''
+        super().update(dt)
+
+        self.spawn_timer += dt
+
+        while self.spawn_timer >= self.spawn_interval:
+            self.spawn_timer -= self.spawn_interval
+            self.spawn_enemy_ninjas()
+
+    def spawn(self, side):
+        '''
+        Adds a new enemy ninja coming from a given side ("RIGHT" or "LEFT") behind its lane.
+
+        Returns: slot of the enemy ninja, None if the pool is exhausted
+        '''
+        return self.add(side, -1 if side == 'RIGHT' else 1, self.speed)
 
     def spawn_enemy_ninjas(self):
-        '''Randomly choose a side for the ninja and adds it to the array.'''
-        side = random.choice(['RIGHT', 'LEFT'])
-        self.rendered_enemy_ninjas.append(EnemyNinja(side=side))
+        '''Randomly choose a side for the ninja and adds it to its lane.'''
+        self.spawn(self.rng.choice(['RIGHT', 'LEFT']))
 
 
 class CollisionController:
@@ -375,65 +784,228 @@ class CollisionController:
         self.panel = panel
         self.gameover_halt = gameover_action
 
-    def __detect_collision(self, A, B):
+        # Positions of the entities, read straight from the arrays of their stores
+        self.shuriken_x = shuriken_control.store.x
+        self.enemy_ninja_x = enemy_ninja_control.store.x
+
+        self.shuriken_half_width = shuriken_control.store.width // 2
+        self.enemy_ninja_width = enemy_ninja_control.store.width
+
+    def __detect_collision(self, A_middle_x, B_x, B_width):
         '''
         Function that detects the collision between two bodies.
-        A collision is detected when the x-coordinate of a body
-        is between the sides of the other. y-coordinates are not
-        considered because there is no need for that in the game.
+        A collision is detected when the middle x-coordinate of a
+        body is between the sides of the other. y-coordinates are
+        not considered because there is no need for that in the game.
 
-        Args: Two bodies with an x-y position property (in form of a list)
+        Args:
+            A_middle_x (float): x-coordinate of the middle of body A
+            B_x (float): x-coordinate of the left side of body B
+            B_width (int): width of body B
 
         Returns: bool representing wheter the bodies have collided 
         '''
-        A_middle_x = A.position[0] + (A.size[0] // 2)
+        return B_x <= A_middle_x <= B_x + B_width
+
+    def __has_passed(self, side, shuriken, enemy_ninja):
+        '''
+        Checks whether a shuriken flew past an enemy ninja coming from
+        the side it was thrown to, without the two having collided.
+
+        Returns: bool representing whether the shuriken passed the enemy ninja
+        '''
+        shuriken_middle_x = self.shuriken_x[shuriken] + self.shuriken_half_width
 
-        B_front_x = B.position[0]
-        B_back_x = B.position[0] + B.size[0]
+        if side == 'RIGHT':
+            return shuriken_middle_x > self.enemy_ninja_x[enemy_ninja] + self.enemy_ninja_width
 
-        if A_middle_x >= B_front_x and A_middle_x <= B_back_x:
-            return True
+        return shuriken_middle_x < self.enemy_ninja_x[enemy_ninja]
 
-        return False
+    def __hits(self, shuriken, enemy_ninja):
+        '''Returns: whether a shuriken hit an enemy ninja, both given by their slots'''
+        return self.__detect_collision(
+            self.shuriken_x[shuriken] + self.shuriken_half_width, self.enemy_ninja_x[enemy_ninja], self.enemy_ninja_width
+        )
 
     def detect_gameover(self):
         '''
-        Checks for collisions between all enemies and the meditating ninja.
-        If a collision has happened a game over procedure is called.
+        Checks for collisions between the enemies and the meditating ninja.
+        The frontmost enemy of each lane is the closest one to the ninja,
+        so it is the only one which can have reached him. If a collision
+        has happened a game over procedure is called.
         '''
-        for enemy_ninja in self.enemy_ninja_control.rendered_enemy_ninjas:
-            if self.__detect_collision(enemy_ninja, self.meditating_ninja):
+        ninja_x = self.meditating_ninja.position[0]
+        ninja_width = self.meditating_ninja.size[0]
+
+        for lane in self.enemy_ninja_control.lanes.values():
+            if lane and self.__detect_collision(
+                self.enemy_ninja_x[lane[0]] + self.enemy_ninja_width // 2, ninja_x, ninja_width
+            ):
                 self.on_gameover_detected()
+                return
 
     def on_gameover_detected(self):
+        '''Calls a procedure to halt game execution'''
+        self.gameover_halt()
+
+    def detect_player_scored(self):
         '''
-        Stops the game music and plays a sound effect. Freezes
-        the screen and calls a procedure to halt game execution.
+        Checks for collisions between all shurikens and all enemy ninjas.
+        A shuriken can only meet the enemies coming from the side it was
+        thrown to, so each lane is checked on its own. If a collision has
+        happened a procedure is called to increase score.
         '''
-        pygame.mixer.music.stop()
-        pygame.mixer.Sound.play(GAME_CONSTANTS['GONG_SOUND'])
+        for side in self.shuriken_control.lanes:
+            self.detect_lane_scored(side)
 
-        time.sleep(2)
+    def detect_lane_scored(self, side):
+        '''
+        Sweeps a lane from the front: shurikens and enemies of a lane are
+        ordered by how far they are from the ninja, so only the frontmost
+        shuriken and the frontmost enemy need comparing. When they collide
+        both are removed and the next pair is compared; when the shuriken
+        has not reached the enemy yet, no other pair in the lane can have
+        collided either.
 
-        self.gameover_halt()
+        Args:
+            side (string): side of the lane to check, must be: "RIGHT" or "LEFT"
+        '''
+        shurikens = self.shuriken_control.lanes[side]
+        enemy_ninjas = self.enemy_ninja_control.lanes[side]
 
-    def detect_player_scored(self):
+        while shurikens and enemy_ninjas:
+            shuriken, enemy_ninja = shurikens[0], enemy_ninjas[0]
+
+            if self.__hits(shuriken, enemy_ninja):
+                self.on_score(shuriken, enemy_ninja)
+
+            elif self.__has_passed(side, shuriken, enemy_ninja):
+                # Lanes out of the usual order, compare every pair instead
+                self.scan_lane_scored(side)
+                return
+
+            else:
+                return
+
+    def scan_lane_scored(self, side):
         '''
-        Checks for collisions between all shurikens and all enemy ninjas.
-        If a collisions has happened a procedure is called to increase score.
+        Compares every shuriken of a lane with every enemy of the lane,
+        oldest first. Each shuriken stops at the first enemy it hits.
+
+        Args:
+            side (string): side of the lane to check, must be: "RIGHT" or "LEFT"
         '''
-        for shuriken in self.shuriken_control.rendered_shurikens:
-            for enemy_ninja in self.enemy_ninja_control.rendered_enemy_ninjas:
-                if self.__detect_collision(shuriken, enemy_ninja):
+        enemy_ninjas = self.enemy_ninja_control.lanes[side]
+
+        for shuriken in list(self.shuriken_control.lanes[side]):
+            for enemy_ninja in enemy_ninjas:
+                if self.__hits(shuriken, enemy_ninja):
                     self.on_score(shuriken, enemy_ninja)
+                    break
 
     def on_score(self, shuriken, enemy_ninja):
-        '''Removes the enemy ninja and the shuriken which colliided from the screen, and increases score'''
-        self.enemy_ninja_control.rendered_enemy_ninjas.remove(enemy_ninja)
-        self.shuriken_control.rendered_shurikens.remove(shuriken)
+        '''Removes the enemy ninja and the shuriken (slots) which colliided from the screen, and increases score'''
+        self.enemy_ninja_control.retire(enemy_ninja)
+        self.shuriken_control.retire(shuriken)
         self.panel.add_score()
 
     def scan_for_collisions(self):
         '''Checks for all types of collisions'''
         self.detect_gameover()
         self.detect_player_scored()
+
+
+def get_default_spawn_time(is_easy):
+    '''Returns: milliseconds between enemy spawns of a difficulty'''
+    return 5000 if is_easy else 1500
+
+
+class GameCore:
+    '''
+    Defines the rules of one game: the meditating ninja, the panel,
+    shurikens, enemy ninjas and their collisions, advanced in steps
+    of simulated game time. It has no display, audio or wall clock,
+    so the game screen drives it in real time while simulations can
+    run it as fast as the CPU allows.
+    '''
+
+    def __init__(self, is_easy, on_game_over=None, spawn_time=None,
+                 enemy_speed=GAME_CONSTANTS['ENEMY_NINJA_SPEED'],
+                 shuriken_speed=GAME_CONSTANTS['SHURIKEN_SPEED'], rng=random, scheduler=None, pool_size=None):
+        '''
+        Instanciates all entities of the game and their controllers.
+
+        Args:
+            is_easy (bool): difficulty of the game
+            on_game_over (function): called once when an enemy reaches the ninja, optional
+            spawn_time (float): milliseconds between enemy spawns, defaults to the difficulty's
+            enemy_speed (float): speed of the enemy ninjas in pixels per second
+            shuriken_speed (float): speed of the shurikens in pixels per second
+            rng (random.Random): source of random numbers, defaults to the random module
+            scheduler (AdaptiveScheduler): picks questions from the player's answers, optional
+            pool_size (int): capacity of the pools of shurikens and of enemy ninjas, defaults to the constants'
+        '''
+        self.is_easy = is_easy
+
+        self.time = 0
+        self.over = False
+
+        self.meditating_ninja = MeditatingNinja()
+
+        # Answers are timed in game time
+        self.panel = Panel(is_easy, rng, scheduler, clock=self.get_time)
+
+        self.shuriken_controller = ShurikenController(
+            self.panel, shuriken_speed, pool_size or GAME_CONSTANTS['SHURIKEN_POOL_SIZE']
+        )
+
+        # Spawn time between enemies vary with difficulty
+        if spawn_time is None:
+            spawn_time = get_default_spawn_time(is_easy)
+
+        self.enemy_ninja_controller = EnemyNinjaController(
+            spawn_time, enemy_speed, rng, pool_size or GAME_CONSTANTS['ENEMY_NINJA_POOL_SIZE']
+        )
+
+        self.collision_controller = CollisionController(
+            self.meditating_ninja, self.shuriken_controller, self.enemy_ninja_controller, self.panel, self.on_gameover_detected
+        )
+
+        self.on_game_over = on_game_over
+
+    def get_time(self):
+        '''Returns: seconds of game time elapsed'''
+        return self.time
+
+    def get_pool_stats(self):
+        '''Returns: dictionary with the statistics of the pools of shurikens and enemy ninjas'''
+        return {
+            'shurikens': self.shuriken_controller.store.get_stats(),
+            'enemy_ninjas': self.enemy_ninja_controller.store.get_stats(),
+        }
+
+    def update(self, dt):
+        '''Advances the game by one simulation step of dt seconds, unless it is over'''
+        if self.over:
+            return
+
+        self.time += dt
+
+        self.shuriken_controller.update(dt)
+        PROFILER.mark('shuriken_update')
+
+        self.enemy_ninja_controller.update(dt)
+        PROFILER.mark('enemy_update')
+
+        self.collision_controller.scan_for_collisions()
+        PROFILER.mark('collisions')
+
+    def on_gameover_detected(self):
+        '''Ends the game and calls the game over procedure, only the first time'''
+        if self.over:
+            return
+
+        self.over = True
+
+        if self.on_game_over:
+            self.on_game_over()
@@ -1,46 +1,190 @@
 import pygame
-from constants import MEDIUM_FONT, SCREEN_NAMES, HIGH_SCORES_CONSTANTS
-from utils import render_font, Ranking, Screen
+from constants import SMALL_FONT, MEDIUM_FONT, SCREEN_NAMES, HIGH_SCORES_CONSTANTS, LEADERBOARD_ADDRESS
+from utils import render_font, get_ranking, Screen
+from leaderboard import get_client
 
 
 class HighScores(Screen):
     '''
     Defines the high scores screen. Inherits screen methods from a parent
     class. Every frame of this screen is generated by running the function
-    render_frame once.
+    render_frame once. The leaderboard is shown one page at a time, and
+    only the high scores of the pages visited are fetched and rendered.
     '''
 
+    background_color = [255, 184, 122]
+
+    reusable = True
+
     def __init__(self, name=''):
         '''
-        Initializes parent class attributes, creates a Ranking
-        object to deal with the high scores textfile, and creates
-        two parallel lists to store the current high scores.
+        Initializes parent class attributes and loads the
+        current high scores into the screen background.
 
         Args:
             name (string): name of the player, optional
         '''
         super().__init__(name)
 
-        self.ranking = Ranking('high_scores.txt')
+        self.page = 0
 
-        self.names = []
-        self.scores = []
+        # Rendered (rank, name, score) rows of each page visited
+        self.pages = {}
 
-        score = self.ranking.get_players()
+        # Number of players in the leaderboard, and the rank of this player (None if they have no score)
+        self.total = 0
+        self.player_rank = None
 
-        for name in self.ranking.get_leaderboard()[:10]:
-            self.names.append(
-                render_font(name, font=MEDIUM_FONT, color=[0, 0, 255])
-            )
+        # Pending requests to the leaderboard server: (page, future) of a page and the future of the rank
+        self.page_request = None
+        self.rank_request = None
+
+        # Whether the page shown could not be fetched, it is requested again the next time it is shown
+        self.unavailable = False
+
+        self.load_high_scores()
+
+    def reopen(self, name=''):
+        '''Prepares the screen to be shown again, with the high scores saved since it was last shown'''
+        super().reopen(name)
+
+        self.load_high_scores()
+
+    def load_high_scores(self):
+        '''
+        Forgets the pages rendered before, as the high scores may have
+        changed, and shows the first page along with the player's rank.
+        They are requested from the leaderboard server if there is one,
+        and shown once they arrive, otherwise they are read from the
+        high scores textfile.
+        '''
+        self.pages = {}
+        self.player_rank = None
+
+        if LEADERBOARD_ADDRESS:
+            self.rank_request = get_client(LEADERBOARD_ADDRESS).fetch_rank(self.name) if self.name else None
+        else:
+            ranking = get_ranking('high_scores.txt')
+
+            self.total = ranking.get_count()
+            self.player_rank = ranking.get_rank(self.name)
+
+        self.show_page(0)
+
+    def show_page(self, page):
+        '''
+        Bakes a page of the leaderboard into the screen background. Its
+        rows are rendered the first time the page is shown, and reused
+        afterwards.
+
+        Args:
+            page (int): number of the page, 0 for the best players
+        '''
+        self.page = page
+        self.unavailable = False
+
+        if page not in self.pages:
+            page_size = HIGH_SCORES_CONSTANTS['PAGE_SIZE']
+
+            if LEADERBOARD_ADDRESS:  # Shows the page without scores until they arrive
+                self.page_request = (page, get_client(LEADERBOARD_ADDRESS).fetch_page(page * page_size, page_size))
+            else:
+                self.set_page(page, get_ranking('high_scores.txt').get_page(page * page_size, page_size))
+
+        self.bake_background()
+
+        self.needs_redraw = True
+
+    def set_page(self, page, entries):
+        '''
+        Renders the rows of a page of the leaderboard.
 
-            self.scores.append(
-                render_font(str(score[name]),
-                            font=MEDIUM_FONT, color=[0, 0, 255])
+        Args:
+            page (int): number of the page, 0 for the best players
+            entries (list): (name, score) of the players of the page, best first
+        '''
+        first_rank = page * HIGH_SCORES_CONSTANTS['PAGE_SIZE'] + 1
+
+        self.pages[page] = [
+            (
+                render_font(f'{rank}.', font=MEDIUM_FONT, color=[0, 0, 255]),
+                render_font(name, font=MEDIUM_FONT, color=[0, 0, 255]),
+                render_font(str(score), font=MEDIUM_FONT, color=[0, 0, 255]),
             )
+            for rank, (name, score) in enumerate(entries, first_rank)
+        ]
+
+    def get_page_count(self):
+        '''Returns: number of pages of the leaderboard, at least one'''
+        return max(1, -(-self.total // HIGH_SCORES_CONSTANTS['PAGE_SIZE']))
+
+    def static_content(self):
+        '''Returns: title, subtitle, the high scores of the page shown and the instructions with their positions'''
+        content = [
+            (HIGH_SCORES_CONSTANTS['TITLE'], [10, 10]),
+            (HIGH_SCORES_CONSTANTS['SUBTITLE'], [10, 50]),
+        ]
+
+        if self.unavailable:
+            content.append((HIGH_SCORES_CONSTANTS['UNAVAILABLE'], [180, 90]))
+
+        for i, (rank, name, score) in enumerate(self.pages.get(self.page, [])):  # Each high score with a 25px margin
+            content.append((rank, [170 - rank.get_width(), 25 * i + 90]))
+            content.append((name, [180, 25 * i + 90]))
+            content.append((score, [360, 25 * i + 90]))
+
+        if self.get_page_count() > 1:
+            content.append((render_font(f'Page {self.page + 1} of {self.get_page_count()}', font=SMALL_FONT), [440, 55]))
+            content.append((HIGH_SCORES_CONSTANTS['PAGE_HINT'], [440, 80]))
+
+        if self.player_rank:
+            content.append((render_font(f'Your rank: {self.player_rank}', font=SMALL_FONT), [440, 115]))
+
+        content.append((HIGH_SCORES_CONSTANTS['BACK'], [180, 360]))
+
+        return content
+
+    def poll_requests(self):
+        '''
+        Shows the responses of the leaderboard server which arrived since
+        the last frame. A page which could not be fetched (e.g. neither the
+        server nor the local file could be read) is shown as unavailable.
+        '''
+        if self.page_request and self.page_request[1].done():
+            page, request = self.page_request
+            response = request.result() if request.exception() is None else {'ok': False}
+            self.page_request = None
+
+            if response['ok']:
+                self.total = response['total']
+                self.set_page(page, response['page'])
+
+                if page == self.page:
+                    self.show_page(page)
+
+            elif page == self.page:
+                self.unavailable = True
+                self.bake_background()
+                self.needs_redraw = True
+
+        if self.rank_request and self.rank_request.done():
+            request, self.rank_request = self.rank_request, None
+            response = request.result() if request.exception() is None else {'ok': False}
+
+            if response['ok']:
+                self.player_rank = response['rank']
+                self.bake_background()
+                self.needs_redraw = True
 
     def render_frame(self):
-        '''Renders one frame of the high scores screen on a pygame display'''
+        '''
+        Renders one frame of the high scores screen on a pygame display.
+        As the screen is static, the display is only updated when an
+        event arrived since the last frame.
+        '''
         for event in pygame.event.get():
+            self.needs_redraw = True
+
             if event.type == pygame.QUIT:
                 self.stop_running()
 
@@ -49,16 +193,20 @@ class HighScores(Screen):
                     self.set_next_screen(SCREEN_NAMES[0])
                     self.stop_running()
 
-        self.screen.fill([255, 184, 122])
+                # Pages are turned once the previous one has arrived
+                elif event.key == pygame.K_LEFT and self.page > 0 and not self.page_request:
+                    self.show_page(self.page - 1)
 
-        self.screen.blit(HIGH_SCORES_CONSTANTS['TITLE'], [10, 10])
+                elif event.key == pygame.K_RIGHT and self.page + 1 < self.get_page_count() and not self.page_request:
+                    self.show_page(self.page + 1)
 
-        self.screen.blit(HIGH_SCORES_CONSTANTS['SUBTITLE'], [10, 50])
+        self.poll_requests()
 
-        for i in range(10):  # Renders each high score with a 25px margin
-            self.screen.blit(self.names[i], [180, 25 * i + 90])
-            self.screen.blit(self.scores[i], [360, 25 * i + 90])
+        if not self.needs_redraw:
+            return
 
-        self.screen.blit(HIGH_SCORES_CONSTANTS['BACK'], [180, 360])
+        self.render_background()
 
         pygame.display.update()
+
+        self.needs_redraw = False
@@ -0,0 +1,235 @@
+'''
+Cache of the game's images already scaled to the sizes they are drawn
+at, so launching the game neither decodes PNGs nor scales them. The
+cache is a single file: a header, a JSON manifest, and the raw RGBA
+pixels of every image. At runtime it is memory-mapped and each image
+becomes a surface over its pixels. Images whose source file changed
+since the cache was built are left out and loaded from the PNG instead.
+
+Usage: python image_cache.py (rebuild after changing images or sizes)
+'''
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import pygame
+
+MAGIC = b'MNINJA01'
+HEADER = struct.Struct('<8sI')  # Magic, length of the manifest in bytes
+ALIGNMENT = 16  # Pixel data of each image starts at a multiple of this
+
+
+def hash_file(path):
+    '''Returns: SHA-1 hex digest of the contents of a file'''
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def image_key(path, size):
+    '''Returns: key of an image scaled to a given size in the manifest'''
+    return f'{path} {size[0]}x{size[1]}'
+
+
+class ImageCache:
+    '''
+    Defines the cache file of scaled images. The file is opened the
+    first time an image is requested, and the pixels stay memory-mapped
+    for as long as the surfaces built over them are in use.
+    '''
+
+    def __init__(self, path='images/scaled.cache'):
+        '''
+        Args:
+            path (string): path to the cache file
+        '''
+        self.path = path
+
+        self.manifest = None
+        self.pixels = None
+        self.lock = threading.Lock()  # Images may be requested by preload threads
+
+        # Whether each source file is unchanged since the cache was built
+        self.valid_sources = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def open(self):
+        '''
+        Reads the manifest and maps the pixels of the cache file, if there
+        is one. A corrupt or truncated file is treated as an empty cache.
+        '''
+        self.manifest = {}
+
+        try:
+            file = open(self.path, 'rb')
+        except OSError:
+            return
+
+        with file:
+            try:
+                magic, manifest_length = HEADER.unpack(file.read(HEADER.size))
+
+                if magic != MAGIC:
+                    return
+
+                manifest = json.loads(file.read(manifest_length))
+
+                # Copy on write: surfaces over the pixels can be drawn on without touching the file
+                pixels = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+            except (struct.error, ValueError, OSError):  # JSONDecodeError and UnicodeDecodeError are ValueErrors
+                return
+
+        if not isinstance(manifest, dict):
+            return
+
+        self.manifest = manifest
+        self.manifest['data_offset'] = HEADER.size + manifest_length
+        self.pixels = pixels
+
+    def find_pixels(self, path, size):
+        '''
+        Returns: (start, length) of the pixels of an image in the mapped
+        file, or None if its entry is missing, malformed or runs past the
+        end of the file
+        '''
+        try:
+            entry = self.manifest.get('images', {}).get(image_key(path, size))
+
+            if entry is None or not self.is_source_valid(self.manifest['sources'][path]):
+                return None
+
+            offset = int(entry['offset'])
+            length = int(entry['length'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+
+        start = self.manifest['data_offset'] + offset
+
+        if offset < 0 or length != size[0] * size[1] * 4 or start + length > len(self.pixels):
+            return None
+
+        return start, length
+
+    def is_source_valid(self, source):
+        '''
+        Returns: whether an image file is the one the cache was built
+        from. Files with the same size and modification time are trusted,
+        others (e.g. after a fresh checkout) are compared by their hash.
+        '''
+        if source['path'] not in self.valid_sources:
+            try:
+                stat = os.stat(source['path'])
+            except OSError:
+                self.valid_sources[source['path']] = False
+                return False
+
+            self.valid_sources[source['path']] = (
+                (stat.st_size, stat.st_mtime_ns) == (source['bytes'], source['mtime_ns'])
+                or hash_file(source['path']) == source['sha1']
+            )
+
+        return self.valid_sources[source['path']]
+
+    def get(self, path, size):
+        '''
+        Args:
+            path (string): path to the image file
+            size (list): width and height the image is scaled to
+
+        Returns:
+            pygame.Surface: the scaled image, or None if the cache has no
+            up to date copy of it
+        '''
+        with self.lock:
+            if self.manifest is None:
+                self.open()
+
+            found = self.find_pixels(path, size) if self.pixels is not None else None
+
+            if found is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+            start, length = found
+            pixels = memoryview(self.pixels)[start:start + length]
+
+            return pygame.image.frombuffer(pixels, size, 'RGBA')
+
+    def build(self, images):
+        '''
+        Writes the cache file with every given image decoded and scaled.
+        The file is written next to the old one and swapped in at once.
+
+        Args:
+            images (list): (path, size) of every scaled image used by the game
+        '''
+        # Imported here since assets uses this module to load images
+        from assets import load_image
+
+        manifest = {'sources': {}, 'images': {}}
+        blobs = []
+        offset = 0
+
+        for path, size in images:
+            if path not in manifest['sources']:
+                stat = os.stat(path)
+                manifest['sources'][path] = {
+                    'path': path, 'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': hash_file(path),
+                }
+
+            key = image_key(path, size)
+
+            if key in manifest['images']:
+                continue
+
+            pixels = pygame.image.tostring(load_image(path, size), 'RGBA')
+            padding = -len(pixels) % ALIGNMENT
+
+            manifest['images'][key] = {'offset': offset, 'length': len(pixels)}
+            blobs.append(pixels + bytes(padding))
+            offset += len(pixels) + padding
+
+        # Pads the manifest so the pixels start aligned
+        encoded = json.dumps(manifest).encode()
+        encoded += b' ' * (-(HEADER.size + len(encoded)) % ALIGNMENT)
+
+        temporary_path = self.path + '.tmp'
+
+        with open(temporary_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(encoded)))
+            file.write(encoded)
+
+            for blob in blobs:
+                file.write(blob)
+
+        os.replace(temporary_path, self.path)
+
+        # Forgets the previous file, it is opened again on the next request
+        self.manifest = None
+        self.valid_sources = {}
+
+    def get_stats(self):
+        '''Returns: dictionary with the images in the cache, hits and misses'''
+        return {
+            'cached_images': len(self.manifest.get('images', {})) if self.manifest else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+if __name__ == '__main__':
+    import time
+    from assets import ASSETS
+    import constants  # Declares the images of the game in ASSETS
+
+    start = time.perf_counter()
+
+    ASSETS.image_cache.build(ASSETS.get_scaled_images())
+
+    print(f'{len(ASSETS.get_scaled_images())} images cached in {ASSETS.image_cache.path} '
+          f'({os.path.getsize(ASSETS.image_cache.path)} bytes) in {(time.perf_counter() - start) * 1000:.1f} ms')
@@ -0,0 +1,366 @@
+'''
+Leaderboard service for a classroom: one server process keeps the
+high scores of every game instance it serves, and games submit and
+fetch scores over TCP. Each message is a line of JSON; requests are
+answered in order on each connection:
+
+    {"op": "submit", "records": [["NAME", 120], ...]} -> {"ok": true}
+    {"op": "top", "count": 10} -> {"ok": true, "top": [["NAME", 120], ...]}
+    {"op": "page", "start": 10, "count": 10} -> {"ok": true, "page": [["NAME", 120], ...], "total": 25}
+    {"op": "rank", "name": "NAME"} -> {"ok": true, "rank": 1, "score": 120}
+
+Submissions from all connections are saved in batches, through a
+Ranking of the server's own high scores file. Names are one to eleven
+uppercase letters, as typed in the menu; other names are refused.
+
+Usage: python leaderboard.py [--host 0.0.0.0] [--port 8765] [--path classroom_scores.txt]
+Games use the server when NINJA_LEADERBOARD is set to its host:port.
+'''
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import asyncio
+import json
+import queue
+import re
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from utils import get_ranking
+
+
+# Names the menu lets players type: one to eleven uppercase letters
+NAME_PATTERN = re.compile('[A-Z]{1,11}')
+
+
+def encode(message):
+    '''Returns: a message (dictionary) as a line of JSON, in bytes'''
+    return json.dumps(message).encode() + b'\n'
+
+
+def parse_address(address):
+    '''Returns: (host, port) of an address written as host:port'''
+    host, port = address.rsplit(':', 1)
+
+    return host, int(port)
+
+
+def answer_query(ranking, request):
+    '''Returns: the response to a page or rank request, answered from a Ranking'''
+    if request['op'] == 'page':
+        return {
+            'ok': True,
+            'page': ranking.get_page(int(request['start']), int(request['count'])),
+            'total': ranking.get_count(),
+        }
+
+    rank = ranking.get_rank(request['name'])
+
+    return {'ok': True, 'rank': rank, 'score': ranking.get_players().get(request['name']) if rank else None}
+
+
+class LeaderboardServer:
+    '''
+    Defines the leaderboard server. Submitted scores are collected from
+    every connection and saved together every flush_interval seconds,
+    in a worker thread so the event loop keeps answering requests.
+    Queries are answered in worker threads too, as the ranking stays
+    locked while a batch is written to disk.
+    '''
+
+    def __init__(self, ranking, flush_interval=0.05):
+        '''
+        Args:
+            ranking (Ranking): high scores kept by the server
+            flush_interval (float): seconds between saves of the submitted scores
+        '''
+        self.ranking = ranking
+        self.flush_interval = flush_interval
+
+        # (records, future resolved once they are saved) of every submission not saved yet
+        self.pending = []
+
+        self.requests = 0
+
+    async def handle_connection(self, reader, writer):
+        '''Answers the requests of a connection, in order, until it is closed'''
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                writer.write(encode(await self.handle_request(line)))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, line):
+        '''Returns: the response to a request, read as a line of JSON'''
+        self.requests += 1
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            request = json.loads(line)
+
+            if request['op'] == 'submit':
+                records = [(name, int(score)) for name, score in request['records']]
+
+                for name, _ in records:
+                    if not isinstance(name, str) or not NAME_PATTERN.fullmatch(name):
+                        return {'ok': False, 'error': f'bad name {name!r}'}
+
+                saved = loop.create_future()
+                self.pending.append((records, saved))
+
+                try:
+                    await saved
+                except Exception as error:
+                    return {'ok': False, 'error': f'not saved: {error!r}'}
+
+                return {'ok': True}
+
+            if request['op'] == 'top':
+                return {'ok': True, 'top': await loop.run_in_executor(None, self.ranking.get_top, int(request['count']))}
+
+            if request['op'] in ('page', 'rank'):
+                return await loop.run_in_executor(None, answer_query, self.ranking, request)
+
+            return {'ok': False, 'error': f"unknown op {request['op']!r}"}
+        except (ValueError, KeyError, TypeError) as error:
+            return {'ok': False, 'error': f'bad request: {error!r}'}
+
+    async def flush_pending(self):
+        '''Saves the submitted scores in batches, forever'''
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            if not self.pending:
+                continue
+
+            batch, self.pending = self.pending, []
+            records = [record for records, _ in batch for record in records]
+
+            try:
+                await loop.run_in_executor(None, self.ranking.new_records, records)
+            except Exception as error:  # Fails this batch only, later ones are still saved
+                for _, saved in batch:
+                    saved.set_exception(error)
+            else:
+                for _, saved in batch:
+                    saved.set_result(True)
+
+    async def serve(self, host, port, on_started=None):
+        '''
+        Accepts connections until cancelled.
+
+        Args:
+            host (string): interface to listen on
+            port (int): port to listen on, 0 for any free port
+            on_started (function): called with the (host, port) listened on, optional
+        '''
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        flusher = asyncio.ensure_future(self.flush_pending())
+
+        if on_started:
+            on_started(server.sockets[0].getsockname()[:2])
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            flusher.cancel()
+
+
+class LeaderboardClient:
+    '''
+    Defines a client of the leaderboard server used by the game. Requests
+    return a concurrent.futures.Future right away, and are sent from a
+    background thread over one persistent connection, so the frame loop
+    never waits on the network. Scores submitted while a request is in
+    flight are sent together. When the server cannot be reached, requests
+    are answered from the local high scores file instead.
+    '''
+
+    def __init__(self, address, fallback_path='high_scores.txt', timeout=2.0, retry_time=10.0):
+        '''
+        Args:
+            address (string): host:port of the leaderboard server
+            fallback_path (string): high scores file used when the server is unreachable
+            timeout (float): seconds to wait for the server before giving up on it
+            retry_time (float): seconds before trying to reach an unreachable server again
+        '''
+        self.address = parse_address(address)
+        self.fallback_path = fallback_path
+        self.timeout = timeout
+        self.retry_time = retry_time
+
+        self.requests = queue.Queue()  # (request, future) waiting to be sent
+
+        self.connection = None
+        self.connection_file = None
+        self.unreachable_until = 0
+
+        self.thread = None
+        self.thread_lock = threading.Lock()
+
+    def request(self, request):
+        '''Returns: Future resolved with the response to a request, starting the client thread if needed'''
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+        future = Future()
+        self.requests.put((request, future))
+
+        return future
+
+    def submit(self, name, score):
+        '''Returns: Future resolved once the score of a player is saved'''
+        return self.request({'op': 'submit', 'records': [[name, score]]})
+
+    def fetch_top(self, count):
+        '''Returns: Future resolved with a list of (name, score) of the best players'''
+        return self.request({'op': 'top', 'count': count})
+
+    def fetch_page(self, start, count):
+        '''Returns: Future resolved with the response to a page request of count players from start (0 for the best)'''
+        return self.request({'op': 'page', 'start': start, 'count': count})
+
+    def fetch_rank(self, name):
+        '''Returns: Future resolved with the response to a rank request of a player'''
+        return self.request({'op': 'rank', 'name': name})
+
+    def run(self):
+        '''
+        Sends the requests waiting, batching the submissions among them,
+        forever. A batch which fails fails the futures of its requests,
+        and the following requests are still sent.
+        '''
+        while True:
+            batch = [self.requests.get()]
+
+            while not self.requests.empty():
+                batch.append(self.requests.get())
+
+            try:
+                self.answer_batch(batch)
+            except Exception as error:  # e.g. the fallback file could not be written
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def answer_batch(self, batch):
+        '''Resolves the futures of a batch of (request, future) with the responses to their requests'''
+        submissions = [(request, future) for request, future in batch if request['op'] == 'submit']
+        others = [(request, future) for request, future in batch if request['op'] != 'submit']
+
+        if submissions:
+            records = [record for request, _ in submissions for record in request['records']]
+            others.insert(0, ({'op': 'submit', 'records': records}, [future for _, future in submissions]))
+
+        try:
+            responses = self.send([request for request, _ in others])
+        except (OSError, ValueError):
+            self.close()
+            responses = [self.answer_locally(request) for request, _ in others]
+
+        for (_, futures), response in zip(others, responses):
+            for future in (futures if isinstance(futures, list) else [futures]):
+                future.set_result(response)
+
+    def send(self, requests):
+        '''Returns: responses of the server to requests, all sent at once before reading the responses'''
+        if self.connection is None:
+            if time.monotonic() < self.unreachable_until:
+                raise ConnectionRefusedError('leaderboard server unreachable')
+
+            try:
+                self.connection = socket.create_connection(self.address, timeout=self.timeout)
+            except OSError:
+                self.unreachable_until = time.monotonic() + self.retry_time
+                raise
+
+            self.connection_file = self.connection.makefile('rb')
+
+        self.connection.sendall(b''.join(encode(request) for request in requests))
+
+        responses = []
+
+        for _ in requests:
+            line = self.connection_file.readline()
+
+            if not line:
+                raise ConnectionResetError('leaderboard server closed the connection')
+
+            responses.append(json.loads(line))
+
+        return responses
+
+    def close(self):
+        '''Closes the connection to the server, if there is one'''
+        if self.connection:
+            self.connection_file.close()
+            self.connection.close()
+
+        self.connection = None
+        self.connection_file = None
+
+    def answer_locally(self, request):
+        '''Returns: the response to a request, answered from the local high scores file'''
+        ranking = get_ranking(self.fallback_path)
+
+        if request['op'] == 'submit':
+            ranking.new_records([tuple(record) for record in request['records']])
+            return {'ok': True}
+
+        if request['op'] == 'top':
+            return {'ok': True, 'top': ranking.get_top(request['count'])}
+
+        return answer_query(ranking, request)
+
+
+# Client of each leaderboard server, shared by the screens of the game
+CLIENTS = {}
+
+
+def get_client(address):
+    '''Returns: the LeaderboardClient of a server's address (host:port), created the first time'''
+    if address not in CLIENTS:
+        CLIENTS[address] = LeaderboardClient(address)
+
+    return CLIENTS[address]
+
+
+def parse_arguments():
+    '''Returns: command line arguments of the leaderboard server'''
+    parser = argparse.ArgumentParser(description='Serves the high scores of The Meditating Ninja to a classroom.')
+    parser.add_argument('--host', default='0.0.0.0', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--path', default='classroom_scores.txt', help='high scores file kept by the server')
+    parser.add_argument('--flush-interval', type=float, default=0.05, help='seconds between saves of submitted scores')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+
+    server = LeaderboardServer(get_ranking(arguments.path), arguments.flush_interval)
+
+    try:
+        asyncio.run(server.serve(
+            arguments.host, arguments.port, lambda address: print(f'Leaderboard serving on {address[0]}:{address[1]}')
+        ))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,126 @@
+'''
+Load generator for the leaderboard server. Many clients connect at
+once, each sending a mix of submit, top, page and rank requests over its own
+persistent connection, and the throughput and latency of the requests
+are reported. Without --address, a server is started in this process
+on a temporary high scores file.
+
+Usage: python leaderboard_load.py --clients 300 --requests 200 [--address host:port]
+'''
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from leaderboard import LeaderboardServer, encode, parse_address
+from utils import Ranking, percentile
+
+
+def player_name(number):
+    '''Returns: name of the player of a given number, in uppercase letters as the server requires'''
+    name = 'P'
+
+    while True:
+        number, letter = divmod(number, 26)
+        name += chr(ord('A') + letter)
+
+        if not number:
+            return name
+
+
+async def run_client(host, port, requests, players, seed, latencies):
+    '''
+    Sends requests one after the other over a single connection.
+
+    Args:
+        host (string): host of the server
+        port (int): port of the server
+        requests (int): number of requests sent
+        players (int): number of different player names used
+        seed (int): seed of the client's random requests
+        latencies (list): receives the seconds each request took
+    '''
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+
+    for _ in range(requests):
+        draw = rng.random()
+        name = player_name(rng.randrange(players))
+
+        if draw < 0.5:
+            request = {'op': 'submit', 'records': [[name, rng.randrange(1000)]]}
+        elif draw < 0.7:
+            request = {'op': 'top', 'count': 10}
+        elif draw < 0.8:
+            request = {'op': 'page', 'start': rng.randrange(players), 'count': 10}
+        else:
+            request = {'op': 'rank', 'name': name}
+
+        start = time.perf_counter()
+
+        writer.write(encode(request))
+        response = json.loads(await reader.readline())
+
+        latencies.append(time.perf_counter() - start)
+
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+
+    writer.close()
+
+
+async def run_load(arguments):
+    '''Returns: number of requests answered, seconds taken and sorted latencies'''
+    server_task = None
+
+    if arguments.address:
+        host, port = parse_address(arguments.address)
+    else:
+        path = os.path.join(tempfile.mkdtemp(), 'scores.txt')
+        started = asyncio.get_running_loop().create_future()
+
+        server = LeaderboardServer(Ranking(path))
+        server_task = asyncio.ensure_future(server.serve('127.0.0.1', 0, started.set_result))
+        host, port = await started
+
+    latencies = []
+    start = time.perf_counter()
+
+    await asyncio.gather(*(
+        run_client(host, port, arguments.requests, arguments.players, seed, latencies)
+        for seed in range(arguments.clients)
+    ))
+
+    elapsed = time.perf_counter() - start
+
+    if server_task:
+        server_task.cancel()
+
+    return len(latencies), elapsed, sorted(latencies)
+
+
+def parse_arguments():
+    '''Returns: command line arguments of the load generator'''
+    parser = argparse.ArgumentParser(description='Measures the throughput of the leaderboard server.')
+    parser.add_argument('--address', help='host:port of a running server, defaults to one started here')
+    parser.add_argument('--clients', type=int, default=300, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=100, help='requests sent by each client')
+    parser.add_argument('--players', type=int, default=5000, help='different player names used')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+
+    answered, elapsed, latencies = asyncio.run(run_load(arguments))
+
+    print(f'{answered} requests from {arguments.clients} clients in {elapsed:.2f}s '
+          f'({answered / elapsed:.0f} requests per second)')
+    print(f'latency: p50 {percentile(latencies, 0.5) * 1000:.1f} ms, '
+          f'p95 {percentile(latencies, 0.95) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms')
@@ -1,9 +1,19 @@
+import time
+
+started = time.perf_counter()  # Start of the program, for the startup timings
+
 import pygame
-from constants import SCREEN_NAMES
+import sys
+from constants import SCREEN_NAMES, FRAME_RATE_CAP, PRELOAD_ASSETS, MUSIC_CONSTANTS
 from menu import Menu
 from game import HardGame, EasyGame
 from rules import Rules
 from high_scores import HighScores
+from assets import ASSETS
+from utils import ScreenManager, TEXT_CACHE, play_music
+from profiler import PROFILER
+
+imported = time.perf_counter()
 
 pygame.init()
 
@@ -11,35 +21,33 @@ screens = dict(
     zip(SCREEN_NAMES, [Menu, EasyGame, HardGame, Rules, HighScores])
 )
 
-clock = pygame.time.Clock()
+screen_manager = ScreenManager(screens, frame_rate=FRAME_RATE_CAP, profiler=PROFILER)
+
 
+if __name__ == '__main__':
+    # Loads and plays main menu music
+    play_music(MUSIC_CONSTANTS['MENU'])
 
-def open_window(screen, name=None):
-    '''
-    Function opens the screen given in the parameters, and initializes
-    the screen with a name saved if there is any. When the screen is 
-    closed, a new screen is opened if there is a next_screen set up.
+    # Decodes the assets of the other screens while the menu is shown
+    if PRELOAD_ASSETS:
+        ASSETS.preload()
 
-    Args: 
-        screen (string): name of the screen to be opened
-        name (string): name of the player, optional.
+    if '--profile' in sys.argv:  # Times every frame from the start, not only once the overlay is shown (F3)
+        PROFILER.enable()
 
-    '''
-    active_screen = screens[screen](name) if name else screens[screen]()
+    screen_manager.run(SCREEN_NAMES[0])  # Opens screen zero (menu)
 
-    while active_screen.run:
-        clock.tick(60)
-        active_screen.render_frame()
+    if PROFILER.profiling and PROFILER.frames:  # Saves the latest frames recorded, to look into stutters
+        PROFILER.dump('frame_profile.json')
 
-    try:
-        open_window(active_screen.next_screen, name=active_screen.name)
-    except KeyError:
-        pygame.quit()
+    if '--timings' in sys.argv:  # Reports how long startup and each screen took to show up
+        print(f'imports: {(imported - started) * 1000:.1f} ms')
+        print(f'first frame: {(screen_manager.first_frame_time - started) * 1000:.1f} ms')
 
+        for previous_screen, screen, seconds in screen_manager.transitions:
+            print(f'{previous_screen} -> {screen}: {seconds * 1000:.1f} ms')
 
-if __name__ == '__main__':
-    # Loads and plays main menu music
-    pygame.mixer.music.load('music/music_calm.wav')
-    pygame.mixer.music.play(-1)
+        for asset, kind, seconds in sorted(ASSETS.get_load_times(), key=lambda load: -load[2]):
+            print(f'{kind} {asset}: {seconds * 1000:.1f} ms')
 
-    open_window(SCREEN_NAMES[0])  # Opens screen zero (menu)
+        print(f'text cache: {TEXT_CACHE.get_stats()}')
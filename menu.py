@@ -1,6 +1,7 @@
 import pygame
 from utils import render_font, Screen
 from constants import MEDIUM_FONT, SCREEN_NAMES, MENU_CONSTANTS
+from assets import ASSETS
 from string import ascii_lowercase
 
 
@@ -52,17 +53,22 @@ class Menu(Screen):
     processing, except the constructor.
     '''
 
+    background_color = [255, 184, 122]
+
+    reusable = True
+
     def __init__(self, name=''):
         '''
         Saves ninja image attribute, adds all buttons to a list 
-        attribute, and initializes the first button as active.
+        attribute, initializes the first button as active, and
+        bakes the static content into the screen background.
 
         Args:
             name (string): name of the player, optional.
         '''
         super().__init__(name)
 
-        self.ninja_image = MENU_CONSTANTS['NINJA_IMAGE'].convert_alpha()
+        self.ninja_image = ASSETS.get(MENU_CONSTANTS['NINJA_IMAGE'])
 
         self.buttons = []
         self.buttons.append(Button(text='PLAY [EASY]', position=[10, 180]))
@@ -73,6 +79,37 @@ class Menu(Screen):
         self.active_button = 0
         self.buttons[self.active_button].toggle_active()
 
+        self.update_name_text()
+
+        self.bake_background()
+
+    def reopen(self, name=''):
+        '''
+        Prepares the menu to be shown again, with the name of the player
+        who just played and the first button active, as when constructed
+        '''
+        super().reopen(name)
+
+        self.buttons[self.active_button].toggle_active()
+        self.active_button = 0
+        self.buttons[self.active_button].toggle_active()
+
+        self.update_name_text()
+
+    def update_name_text(self):
+        '''Renders the name typed by the player, only called when the name changes'''
+        self.name_text = render_font(self.name, font=MEDIUM_FONT)
+
+    def static_content(self):
+        '''Returns: title, name label and box, warning and ninja image with their positions'''
+        return [
+            (MENU_CONSTANTS['TITLE'], [10, 10]),
+            (MENU_CONSTANTS['NAME'], [10, 80]),
+            (MENU_CONSTANTS['NAME_BOX'], [220, 70]),
+            (MENU_CONSTANTS['WARNING'], [210, 115]),
+            (self.ninja_image, [290, 202]),
+        ]
+
     def process_arrow_pressed(self, key):
         '''
         When the user presses arrow up or down, the active button changes.
@@ -105,17 +142,19 @@ class Menu(Screen):
 
     def process_typing_name(self, key):
         '''Changes the name attribute when a letter or the backspace key is pressed.'''
+        previous_name = self.name
+
         if key == pygame.K_BACKSPACE:
             self.name = self.name[:-1]
 
-        if len(self.name) > 10:
-            return
-
         key_name = pygame.key.name(key)
 
-        if key_name in ascii_lowercase:
+        if len(self.name) <= 10 and key_name in ascii_lowercase:
             self.name += key_name.upper()
 
+        if self.name != previous_name:
+            self.update_name_text()
+
     def render_frame(self):
         '''Renders one frame of the menu on a pygame display'''
         for event in pygame.event.get():
@@ -127,17 +166,9 @@ class Menu(Screen):
                 self.process_typing_name(event.key)
                 self.process_navigation_action(event.key)
 
-        self.screen.fill([255, 184, 122])
-
-        self.screen.blit(MENU_CONSTANTS['TITLE'], [10, 10])
-        self.screen.blit(MENU_CONSTANTS['NAME'], [10, 80])
-        self.screen.blit(MENU_CONSTANTS['NAME_BOX'], [220, 70])
-
-        self.screen.blit(MEDIUM_FONT.render(
-            self.name, True, [0, 0, 0]), [225, 80])
+        self.render_background()
 
-        self.screen.blit(MENU_CONSTANTS['WARNING'], [210, 115])
-        self.screen.blit(self.ninja_image, [290, 202])
+        self.screen.blit(self.name_text, [225, 80])
 
         for button in self.buttons:
             button.render(self.screen)
@@ -0,0 +1,209 @@
+'''
+Frame profiler of the game. Each frame is split into phases (waiting
+for the frame rate cap, input, updates, collisions, drawing, display
+update) timed by hooks placed in the frame loop, and the latest frames
+are kept in a ring buffer. The game screen can show an overlay with
+the frame rate, a histogram of frame times and the number of entities,
+and the frames recorded can be dumped to a JSON file. While disabled,
+every hook returns at once.
+'''
+import collections
+import json
+import time
+import pygame
+from constants import TINY_FONT
+from utils import GlyphAtlas, percentile
+
+
+class FrameProfiler:
+    '''
+    Defines a profiler of frames. A frame is opened by begin_frame,
+    each call of mark adds the time since the previous hook to a phase,
+    and end_frame records the frame, adding the rest of its time to
+    the "other" phase. Phases may be marked many times in a frame (e.g.
+    once per simulation step), their times add up.
+    '''
+
+    PHASES = [
+        'wait', 'events', 'shuriken_update', 'enemy_update', 'collisions', 'background',
+        'panel_render', 'shuriken_render', 'enemy_render', 'overlay', 'display_update', 'other',
+    ]
+
+    # Upper bounds (ms) of the frame times counted in each bar of the histogram, the last bar counts the rest
+    HISTOGRAM_BOUNDS = [5, 10, 15, 17, 20, 25, 33, 50, 100]
+
+    OVERLAY_RECT = pygame.Rect(5, 295, 170, 100)
+
+    def __init__(self, capacity=600):
+        '''
+        Args:
+            capacity (int): number of latest frames kept
+        '''
+        self.enabled = False
+        self.overlay = False
+
+        # Whether frames are recorded whether or not the overlay is shown (main.py --profile)
+        self.profiling = False
+
+        # (seconds taken, seconds taken by each phase, entities on screen) of the latest frames
+        self.frames = collections.deque(maxlen=capacity)
+
+        self.phase_indexes = {phase: i for i, phase in enumerate(self.PHASES)}
+
+        # Phase times of the frame being recorded, and when it started and was last marked
+        self.current = None
+        self.frame_start = None
+        self.last_mark = None
+
+        self.entities = 0
+        self.pool_stats = {}  # Statistics of each pool of entities, as of the latest frame
+
+        # Glyphs of the overlay's texts, only rendered once it is shown
+        self.atlas = GlyphAtlas(TINY_FONT, [255, 255, 255])
+
+    def enable(self):
+        '''Starts recording frames, until the program exits'''
+        self.profiling = True
+        self.enabled = True
+
+    def toggle_overlay(self):
+        '''Shows or hides the overlay, recording frames while it is shown unless enable was called'''
+        self.overlay = not self.overlay
+        self.enabled = self.overlay or self.profiling
+
+    def begin_frame(self):
+        '''Opens a new frame'''
+        if not self.enabled:
+            return
+
+        self.current = [0.0] * len(self.PHASES)
+        self.frame_start = self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        '''Adds the time since the previous hook of the frame to a phase'''
+        if self.frame_start is None:
+            return
+
+        now = time.perf_counter()
+
+        self.current[self.phase_indexes[phase]] += now - self.last_mark
+        self.last_mark = now
+
+    def set_entity_count(self, count):
+        '''Records the number of entities on screen in the frame'''
+        self.entities = count
+
+    def set_pool_stats(self, pool_stats):
+        '''Records the statistics of each pool of entities (dictionary of get_stats dictionaries)'''
+        self.pool_stats = pool_stats
+
+    def end_frame(self):
+        '''Records the frame opened by begin_frame'''
+        if self.frame_start is None:
+            return
+
+        self.mark('other')
+
+        self.frames.append((self.last_mark - self.frame_start, tuple(self.current), self.entities))
+        self.frame_start = None
+
+    def get_fps(self):
+        '''Returns: frames per second over the latest second recorded'''
+        elapsed = 0
+        frames = 0
+
+        for seconds, _, _ in reversed(self.frames):
+            if elapsed + seconds > 1:
+                break
+
+            elapsed += seconds
+            frames += 1
+
+        return frames / elapsed if elapsed else 0
+
+    def get_histogram(self):
+        '''Returns: number of frames recorded in each bar of the histogram of frame times'''
+        counts = [0] * (len(self.HISTOGRAM_BOUNDS) + 1)
+
+        for seconds, _, _ in self.frames:
+            milliseconds = seconds * 1000
+            bar = 0
+
+            while bar < len(self.HISTOGRAM_BOUNDS) and milliseconds > self.HISTOGRAM_BOUNDS[bar]:
+                bar += 1
+
+            counts[bar] += 1
+
+        return counts
+
+    def render_overlay(self, display):
+        '''
+        Draws the frame rate, the latest frame time, the number of
+        entities, the allocations avoided by reusing pooled entities and
+        the histogram of frame times on a given display.
+
+        Returns:
+            pygame.Rect: area of the display touched
+        '''
+        x, y = self.OVERLAY_RECT.topleft
+        display.fill([30, 30, 30], self.OVERLAY_RECT)
+
+        latest = self.frames[-1][0] * 1000 if self.frames else 0
+
+        self.atlas.render(display, f'{self.get_fps():.0f} fps {latest:.1f} ms', [x + 5, y + 3])
+        reused = sum(stats['reused'] for stats in self.pool_stats.values())
+        self.atlas.render(display, f'{self.entities} entities {reused} reused', [x + 5, y + 22])
+
+        # One bar per bucket of frame times, green up to 60 fps, yellow up to 30 fps, red beyond
+        counts = self.get_histogram()
+        tallest = max(max(counts), 1)
+        bottom = self.OVERLAY_RECT.bottom - 5
+
+        for bar, count in enumerate(counts):
+            height = 45 * count // tallest
+            bound = self.HISTOGRAM_BOUNDS[min(bar, len(self.HISTOGRAM_BOUNDS) - 1)]
+            color = [80, 200, 80] if bound <= 17 else [230, 200, 60] if bound <= 33 else [220, 70, 70]
+
+            display.fill(color, [x + 5 + 16 * bar, bottom - height, 14, height])
+
+        return self.OVERLAY_RECT.copy()
+
+    def get_summary(self):
+        '''Returns: dictionary with the mean, p50, p95 and p99 (in ms) of the frames and of each phase'''
+        summary = {}
+
+        columns = [('frame', [seconds for seconds, _, _ in self.frames])]
+        columns += [(phase, [phases[i] for _, phases, _ in self.frames]) for i, phase in enumerate(self.PHASES)]
+
+        for name, values in columns:
+            if not values:
+                continue
+
+            values = sorted(values)
+
+            summary[name] = {
+                'mean_ms': sum(values) / len(values) * 1000,
+                'p50_ms': percentile(values, 0.5) * 1000,
+                'p95_ms': percentile(values, 0.95) * 1000,
+                'p99_ms': percentile(values, 0.99) * 1000,
+            }
+
+        return summary
+
+    def dump(self, path):
+        '''Writes the summary and every frame recorded to a JSON file'''
+        with open(path, 'w') as file:
+            json.dump({
+                'phases': self.PHASES,
+                'summary': self.get_summary(),
+                'pools': self.pool_stats,
+                # (ms taken, ms taken by each phase, entities on screen) of each frame, oldest first
+                'frames': [
+                    [seconds * 1000, [phase * 1000 for phase in phases], entities]
+                    for seconds, phases, entities in self.frames
+                ],
+            }, file)
+
+
+# Profiler of the frame loop, disabled until main.py is run with --profile or the overlay is toggled
+PROFILER = FrameProfiler()
@@ -10,19 +10,46 @@ class Rules(Screen):
     function render_frame once.
     '''
 
+    background_color = [255, 184, 122]
+
+    reusable = True
+
     def __init__(self, name=''):
         '''
         Calls the parent class constructor to inherit
-        screen class attributes.
+        screen class attributes, and bakes the rules into
+        the screen background.
 
         Args:
             name (string): name of the player, optional
         '''
         super().__init__(name)
 
+        self.bake_background()
+
+    def static_content(self):
+        '''Returns: title, subtitle, every rule and the back instruction with their positions'''
+        content = [
+            (RULES_CONSTANTS['TITLE'], [10, 10]),
+            (RULES_CONSTANTS['SUBTITLE'], [10, 50]),
+        ]
+
+        for i in range(1, 12):  # Rules are listed with a 25px margin
+            content.append((RULES_CONSTANTS[f'RULE_{i}'], [10, 25 * i + 60]))
+
+        content.append((RULES_CONSTANTS['BACK'], [180, 370]))
+
+        return content
+
     def render_frame(self):
-        '''Renders one frame of the rules screen on a pygame display'''
+        '''
+        Renders one frame of the rules screen on a pygame display.
+        As the screen is static, the display is only updated when
+        an event arrived since the last frame.
+        '''
         for event in pygame.event.get():
+            self.needs_redraw = True
+
             if event.type == pygame.QUIT:
                 self.stop_running()
 
@@ -31,24 +58,11 @@ class Rules(Screen):
                     self.set_next_screen(SCREEN_NAMES[0])
                     self.stop_running()
 
-        self.screen.fill([255, 184, 122])
-
-        self.screen.blit(RULES_CONSTANTS['TITLE'], [10, 10])
+        if not self.needs_redraw:
+            return
 
-        self.screen.blit(RULES_CONSTANTS['SUBTITLE'], [10, 50])
-
-        self.screen.blit(RULES_CONSTANTS['RULE_1'], [10, 85])
-        self.screen.blit(RULES_CONSTANTS['RULE_2'], [10, 110])
-        self.screen.blit(RULES_CONSTANTS['RULE_3'], [10, 135])
-        self.screen.blit(RULES_CONSTANTS['RULE_4'], [10, 160])
-        self.screen.blit(RULES_CONSTANTS['RULE_5'], [10, 185])
-        self.screen.blit(RULES_CONSTANTS['RULE_6'], [10, 210])
-        self.screen.blit(RULES_CONSTANTS['RULE_7'], [10, 235])
-        self.screen.blit(RULES_CONSTANTS['RULE_8'], [10, 260])
-        self.screen.blit(RULES_CONSTANTS['RULE_9'], [10, 285])
-        self.screen.blit(RULES_CONSTANTS['RULE_10'], [10, 310])
-        self.screen.blit(RULES_CONSTANTS['RULE_11'], [10, 335])
-
-        self.screen.blit(RULES_CONSTANTS['BACK'], [180, 370])
+        self.render_background()
 
         pygame.display.update()
+
+        self.needs_redraw = False
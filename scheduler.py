@@ -0,0 +1,177 @@
+'''
+Adaptive scheduling of the math questions. Every answer the player
+gives is recorded per fact (operation, A, B): how often it was tried,
+how often it was right, and how long it took. Facts the player gets
+wrong or answers slowly are then asked more often than facts they
+already know. Recording an answer and picking a question both take
+O(log n) time, so they can run inside the key press handler.
+'''
+import array
+import random
+from game_utils import QUESTION_BANK
+
+OPERATION_SYMBOLS = ['+', '-', 'x', '/']
+NUMBER_SLOTS = 13  # Both numbers of a question go from 0 to 12
+
+
+def fact_index(operation_symbol, A, B):
+    '''Returns: index of the fact (operation, A, B) in the arrays of statistics'''
+    return (OPERATION_SYMBOLS.index(operation_symbol) * NUMBER_SLOTS + A) * NUMBER_SLOTS + B
+
+
+class FenwickTree:
+    '''
+    Defines a Fenwick tree (binary indexed tree) of weights. A weight
+    can be changed, the sum of the first weights computed, and the
+    index where the running sum crosses a value found, in O(log n).
+    '''
+
+    def __init__(self, weights):
+        '''
+        Builds the tree in O(n).
+
+        Args:
+            weights (list): initial non-negative weight of each index
+        '''
+        self.size = len(weights)
+        self.tree = array.array('d', [0.0]) + array.array('d', weights)
+
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, index, delta):
+        '''Adds delta to the weight of a given index'''
+        i = index + 1
+
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, count):
+        '''Returns: sum of the first count weights'''
+        total = 0.0
+
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+
+        return total
+
+    def find(self, value):
+        '''
+        Returns: the index whose weight covers a given value of the
+        running sum, i.e. the first index whose prefix sum exceeds it
+        (size if the value is not below the sum of all weights)
+        '''
+        position = 0
+        step = 1 << self.size.bit_length()
+
+        while step:
+            next_position = position + step
+
+            if next_position <= self.size and self.tree[next_position] <= value:
+                position = next_position
+                value -= self.tree[next_position]
+
+            step >>= 1
+
+        return position
+
+
+class AdaptiveScheduler:
+    '''
+    Defines a scheduler of the questions of one difficulty. Each fact
+    of the question bank starts with the weight it has in the game (so
+    every operation is equally likely), multiplied by how much practice
+    the player needs on it judging by their answers.
+    '''
+
+    def __init__(self, is_easy, target_time=3.0, smoothing=0.3):
+        '''
+        Args:
+            is_easy (bool): difficulty of the questions scheduled
+            target_time (float): seconds in which a known fact should be answered
+            smoothing (float): weight of the latest answer time in the average time of a fact
+        '''
+        self.is_easy = is_easy
+        self.target_time = target_time
+        self.smoothing = smoothing
+
+        size = len(OPERATION_SYMBOLS) * NUMBER_SLOTS * NUMBER_SLOTS
+
+        # Statistics of each fact, indexed by fact_index
+        self.attempts = array.array('I', bytes(4 * size))
+        self.correct = array.array('I', bytes(4 * size))
+        self.average_time = array.array('f', [target_time]) * size
+
+        # Facts of the question bank and their weight in the game, indexed by fact_index
+        self.facts = [None] * size
+        self.base_weights = array.array('d', bytes(8 * size))
+
+        bank = QUESTION_BANK[is_easy]
+
+        for operation_facts in bank:
+            for fact in operation_facts:
+                index = fact_index(fact.operation_symbol, fact.A, fact.B)
+
+                self.facts[index] = fact
+                self.base_weights[index] = 1 / (len(bank) * len(operation_facts))
+
+        self.weights = array.array('d', (self.get_weight(index) for index in range(size)))
+        self.tree = FenwickTree(self.weights)
+
+        self.last_index = max(index for index in range(size) if self.facts[index])
+
+    def get_weight(self, index):
+        '''
+        Returns: weight of a fact, higher the more often it was answered
+        wrong and the slower it was answered, 0 if it is not in the bank
+        '''
+        if self.facts[index] is None:
+            return 0.0
+
+        # Laplace smoothed error rate, one half for facts never asked
+        error_rate = 1 - (self.correct[index] + 1) / (self.attempts[index] + 2)
+        slowness = min(max(self.average_time[index] / self.target_time, 0.25), 4)
+
+        return self.base_weights[index] * (0.5 + 2 * error_rate + slowness)
+
+    def record(self, fact, is_right, seconds):
+        '''
+        Records an answer to a fact and updates its weight.
+
+        Args:
+            fact (Fact): question answered
+            is_right (bool): whether the answer was right
+            seconds (float): time taken to answer since the question was shown
+        '''
+        index = fact_index(fact.operation_symbol, fact.A, fact.B)
+
+        self.attempts[index] += 1
+        self.correct[index] += is_right
+        self.average_time[index] += self.smoothing * (seconds - self.average_time[index])
+
+        weight = self.get_weight(index)
+        self.tree.add(index, weight - self.weights[index])
+        self.weights[index] = weight
+
+    def pick(self, rng=random):
+        '''Returns: a Fact picked at random, with chances proportional to its weight'''
+        index = self.tree.find(rng.random() * self.tree.prefix_sum(self.tree.size))
+
+        # A value rounded up to the total weight falls past the last fact
+        return self.facts[min(index, self.last_index)]
+
+    def get_stats(self, fact):
+        '''Returns: dictionary with the attempts, right answers, average time and weight of a fact'''
+        index = fact_index(fact.operation_symbol, fact.A, fact.B)
+
+        return {
+            'attempts': self.attempts[index],
+            'correct': self.correct[index],
+            'average_time': self.average_time[index],
+            'weight': self.weights[index],
+        }
@@ -0,0 +1,387 @@
+'''
+Storage of the high scores. Records are appended to a log file, one
+line per new high score, and the file is compacted to one line per
+player once old records pile up. Many games may share the same file.
+In memory, players are kept in a skip list ordered by score, so a new
+score is placed, the rank of a player found and a page of k players
+listed in O(log n) (+ k) time.
+'''
+import contextlib
+import os
+import random
+import threading
+import time
+
+try:  # Advisory file locks are taken with msvcrt on Windows, fcntl elsewhere
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+# First line of a log file, stamped with the time the file was written
+LOG_HEADER = '# The Meditating Ninja high scores: score<TAB>name'
+
+
+def check_records(records):
+    '''Raises ValueError if a (name, score) record cannot be written as a line of the log'''
+    for name, score in records:
+        if '\t' in name or '\n' in name or '\r' in name:
+            raise ValueError(f'name {name!r} contains a tab or a line break')
+
+        if not isinstance(score, int):
+            raise ValueError(f'score {score!r} is not an integer')
+
+
+def parse_record(line):
+    '''Returns: the (name, score) record of a line of the log, None for comments and lines that do not parse'''
+    try:
+        line = line.decode().rstrip('\r')
+        score, name = line.split('\t', 1)
+
+        return name, int(score)
+    except ValueError:  # Also raised by bytes which are not UTF-8
+        return None
+
+
+class SkipNode:
+    '''Defines a node of a skip list, linked to the next node on each of its levels'''
+
+    def __init__(self, key, levels, tail=None):
+        '''
+        Args:
+            key (tuple): key of the node, None for the head and the tail
+            levels (int): number of levels the node is linked on
+            tail (SkipNode): node the links point to at first
+        '''
+        self.key = key
+        self.next = [tail] * levels
+        self.width = [1] * levels  # Number of level 0 steps each link skips
+
+
+class ScoreIndex:
+    '''
+    Defines an indexable skip list of keys kept in ascending order.
+    Keys of players are (-score, order, name), so the best score comes
+    first and ties keep the order in which players first appeared.
+    '''
+
+    MAX_LEVELS = 24  # Enough for millions of players
+
+    def __init__(self):
+        '''Initializes an empty skip list'''
+        self.tail = SkipNode(None, 0)
+        self.head = SkipNode(None, self.MAX_LEVELS, self.tail)
+
+        self.size = 0
+
+        # Own source of random levels, so the game's random numbers are not disturbed
+        self.rng = random.Random(0)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        '''Yields: every key, in ascending order'''
+        node = self.head.next[0]
+
+        while node is not self.tail:
+            yield node.key
+            node = node.next[0]
+
+    def iterate_from(self, index):
+        '''Yields: every key from a given position on (0 for the first), finding it in O(log n) time'''
+        if not 0 <= index < self.size:
+            return
+
+        node = self.head
+        remaining = index + 1  # Level 0 steps from the head to the node at that position
+
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        while node is not self.tail:
+            yield node.key
+            node = node.next[0]
+
+    def rank(self, key):
+        '''Returns: position of a key in the skip list (0 for the first), in O(log n) time'''
+        chain, steps = self.find_chain(key)
+
+        if chain[0].next[0] is self.tail or chain[0].next[0].key != key:
+            raise KeyError(key)
+
+        return steps[0]
+
+    def random_levels(self):
+        '''Returns: number of levels of a new node, each level half as likely as the one below'''
+        levels = 1
+
+        while levels < self.MAX_LEVELS and self.rng.random() < 0.5:
+            levels += 1
+
+        return levels
+
+    def find_chain(self, key):
+        '''
+        Returns: the last node before a key on every level, and the
+        number of level 0 steps taken to reach each of them
+        '''
+        chain = [None] * self.MAX_LEVELS
+        steps = [0] * self.MAX_LEVELS
+
+        node = self.head
+        position = 0
+
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not self.tail and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+
+            chain[level] = node
+            steps[level] = position
+
+        return chain, steps
+
+    def insert(self, key):
+        '''Adds a key to the skip list, in O(log n) time'''
+        chain, steps = self.find_chain(key)
+
+        levels = self.random_levels()
+        node = SkipNode(key, levels, self.tail)
+
+        for level in range(levels):
+            previous = chain[level]
+            skipped = steps[0] - steps[level]  # Steps from the previous node to the new one, minus one
+
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+
+            node.width[level] = previous.width[level] - skipped
+            previous.width[level] = skipped + 1
+
+        for level in range(levels, self.MAX_LEVELS):  # Links passing over the new node
+            chain[level].width[level] += 1
+
+        self.size += 1
+
+    def remove(self, key):
+        '''Removes a key from the skip list, in O(log n) time'''
+        chain, _ = self.find_chain(key)
+
+        node = chain[0].next[0]
+
+        if node is self.tail or node.key != key:
+            raise KeyError(key)
+
+        for level in range(len(node.next)):
+            chain[level].width[level] += node.width[level] - 1
+            chain[level].next[level] = node.next[level]
+
+        for level in range(len(node.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+
+        self.size -= 1
+
+
+def lock_file(file):
+    '''Waits for and takes an advisory lock on an open file, shared by every process using it'''
+    if msvcrt:
+        file.seek(0)
+
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:  # Gave up after retrying for a few seconds
+                continue
+
+    fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+
+def unlock_file(file):
+    '''Releases the advisory lock taken on an open file'''
+    if msvcrt:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class ScoreLog:
+    '''
+    Defines the log file of high score records, which many games (e.g.
+    on the computers of a lab sharing a drive) may write at once. New
+    records are read incrementally, from where the previous read
+    stopped. Writers take an advisory lock on a file next to the log
+    (path + '.lock'): records are appended in batches while holding it,
+    and the log is rewritten by writing a new file and renaming it over
+    the old one, so readers never see a truncated file. Files in the
+    old format (a line with a name followed by a line with its score)
+    are migrated to the log format the first time they are read.
+    '''
+
+    def __init__(self, path):
+        '''
+        Args:
+            path (string): path to the log file
+        '''
+        self.path = path
+
+        self.offset = 0  # Bytes of the file already read
+        self.records = 0  # Records in the file, including outdated ones
+
+        # Header of the file when it was last read, which changes whenever it is rewritten
+        self.header = None
+
+        # Lock file held while writing, and how many nested writes hold it
+        self.lock_path = path + '.lock'
+        self.lock_file = None
+        self.lock_depth = 0
+
+        # Keeps the threads of this game from writing at once
+        self.thread_lock = threading.RLock()
+
+    @contextlib.contextmanager
+    def lock(self):
+        '''Holds the lock of the log while a block of code runs, blocks may be nested'''
+        with self.thread_lock:
+            if self.lock_depth == 0:
+                self.lock_file = open(self.lock_path, 'a+b')
+                lock_file(self.lock_file)
+
+            self.lock_depth += 1
+
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+
+                if self.lock_depth == 0:
+                    unlock_file(self.lock_file)
+                    self.lock_file.close()
+                    self.lock_file = None
+
+    def read_new(self):
+        '''
+        Reads the records added to the file since the last read.
+
+        Returns:
+            tuple: list of (name, score) records, and whether the file was
+            replaced (e.g. compacted), in which case all of it was read again
+        '''
+        try:
+            with open(self.path, 'rb') as file:
+                header = file.readline()
+                replaced = self.header is not None and header != self.header
+
+                if replaced:
+                    self.offset = 0
+                    self.records = 0
+
+                file.seek(self.offset)
+                data = file.read()
+        except FileNotFoundError:
+            return [], False
+
+        if self.offset == 0 and data and not data.startswith(LOG_HEADER.encode()):
+            with self.lock():
+                return self.migrate(), replaced
+
+        self.header = header
+
+        end = data.rfind(b'\n') + 1  # A record being written by another game is read next time
+        self.offset += end
+
+        # Split on line feeds only, names may hold any other character
+        records = []
+
+        for line in data[:end].split(b'\n'):
+            record = parse_record(line) if line and not line.startswith(b'#') else None
+
+            if record:
+                records.append(record)
+
+        self.records += len(records)
+
+        return records, replaced
+
+    def migrate(self):
+        '''
+        Rewrites a file in the old format as a log, unless another game
+        migrated it first. Called while holding the lock.
+
+        Returns:
+            list: (name, score) records of the file
+        '''
+        with open(self.path, 'rb') as file:
+            data = file.read()
+
+        if data.startswith(LOG_HEADER.encode()):
+            records, _ = self.read_new()
+            return records
+
+        # Lines may end in \r\n if the file was written on Windows; pairs which do not parse are dropped
+        lines = [line.rstrip('\r') for line in data.decode(errors='replace').split('\n')]
+        records = []
+
+        for i in range(0, len(lines) - 1, 2):
+            try:
+                record = (lines[i], int(lines[i + 1]))
+                check_records([record])
+            except ValueError:
+                continue
+
+            records.append(record)
+
+        self.rewrite(records)
+
+        return records
+
+    def new_header(self):
+        '''Returns: header line (bytes) of a file written now, telling other readers it was replaced'''
+        return f'{LOG_HEADER}, written {time.time_ns()}\n'.encode()
+
+    def append(self, records):
+        '''
+        Appends a batch of (name, score) records to the end of the file,
+        they are read back by the next read. Raises ValueError, writing
+        nothing, if a name holds a tab or a line break.
+        '''
+        check_records(records)
+
+        with self.lock():
+            with open(self.path, 'ab') as file:
+                if file.tell() == 0:
+                    file.write(self.new_header())
+
+                # A single write, so the batch lands in the file at once
+                file.write(''.join(f'{score}\t{name}\n' for name, score in records).encode())
+                file.flush()
+                os.fsync(file.fileno())
+
+        # The records are counted when read back, along with any other game appended before them
+
+    def rewrite(self, records):
+        '''
+        Replaces the contents of the file with the given (name, score)
+        records. The new contents are written to a temporary file which
+        is then renamed over the file, so the swap happens at once.
+        '''
+        header = self.new_header()
+        temporary_path = f'{self.path}.{os.getpid()}.tmp'
+
+        with self.lock():
+            with open(temporary_path, 'wb') as file:
+                file.write(header)
+                file.write(''.join(f'{score}\t{name}\n' for name, score in records).encode())
+                file.flush()
+                os.fsync(file.fileno())
+
+                self.offset = file.tell()
+
+            os.replace(temporary_path, self.path)
+
+        self.header = header
+        self.records = len(records)
@@ -0,0 +1,228 @@
+'''
+Headless simulation of the game, to tune its difficulty. Games run
+the same rules as the game screen (GameCore) on a virtual clock,
+without display or audio, as fast as the CPU allows. A player policy
+decides when questions get answered and shurikens get thrown.
+
+Usage: python simulation.py [--games N] [--easy] [--answer-time SECONDS] ...
+'''
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import random
+import time
+from constants import GAME_CONSTANTS
+from game_utils import GameCore, get_default_spawn_time
+from utils import percentile
+
+
+class Player:
+    '''
+    Defines a simulated player. Before every simulation step the player
+    gets to act on the game core, e.g. answering the math question with
+    core.panel.submit_answer or throwing with core.shuriken_controller.try_throw.
+    '''
+
+    def start(self, core):
+        '''Called once with the game core before the game starts'''
+
+    def act(self, core):
+        '''Called with the game core before every simulation step, a player who never acts by default'''
+
+
+class ScriptedPlayer(Player):
+    '''
+    Defines a player who answers each question after a delay drawn from
+    a normal distribution, gets it right with a given probability, and
+    throws one shuriken at every enemy ninja as soon as he walks on screen.
+    '''
+
+    def __init__(self, answer_time=3.0, answer_time_sd=1.0, accuracy=0.9, rng=random):
+        '''
+        Args:
+            answer_time (float): mean seconds taken to answer a question
+            answer_time_sd (float): standard deviation of the answer time
+            accuracy (float): probability of an answer being right, from 0 to 1
+            rng (random.Random): source of random numbers, defaults to the random module
+        '''
+        self.answer_time = answer_time
+        self.answer_time_sd = answer_time_sd
+        self.accuracy = accuracy
+        self.rng = rng
+
+        self.next_answer_time = 0
+
+    def schedule_answer(self, core):
+        '''Picks the game time at which the player will answer next'''
+        delay = max(0.1, self.rng.gauss(self.answer_time, self.answer_time_sd))
+        self.next_answer_time = core.time + delay
+
+    def start(self, core):
+        '''Starts thinking about the first question'''
+        self.schedule_answer(core)
+
+    def act(self, core):
+        '''Answers the question when its answer time came, and throws at enemies on screen'''
+        if core.time >= self.next_answer_time:
+            answer = int(core.panel.math_question.answer)
+
+            if self.rng.random() >= self.accuracy:
+                answer += 1
+
+            core.panel.submit_answer(str(answer))
+            self.schedule_answer(core)
+
+        enemy_ninja_store = core.enemy_ninja_controller.store
+
+        for side, enemy_ninjas in core.enemy_ninja_controller.lanes.items():
+            visible = sum(1 for enemy_ninja in enemy_ninjas if enemy_ninja_store.is_on_screen(enemy_ninja))
+
+            if visible > len(core.shuriken_controller.lanes[side]):
+                core.shuriken_controller.try_throw(side)
+
+
+def run_game(player, is_easy=False, seed=None, spawn_time=None,
+             enemy_speed=GAME_CONSTANTS['ENEMY_NINJA_SPEED'],
+             shuriken_speed=GAME_CONSTANTS['SHURIKEN_SPEED'],
+             step=GAME_CONSTANTS['SIMULATION_STEP'], max_time=600, pool_size=None):
+    '''
+    Simulates one game until an enemy ninja reaches the meditating
+    ninja or max_time seconds of game time have passed.
+
+    Args:
+        player (Player): policy playing the game
+        is_easy (bool): difficulty of the game
+        seed (int): seed of the game's random numbers, optional
+        spawn_time (float): milliseconds between enemy spawns, defaults to the difficulty's
+        enemy_speed (float): speed of the enemy ninjas in pixels per second
+        shuriken_speed (float): speed of the shurikens in pixels per second
+        step (float): seconds of game time advanced by each simulation step
+        max_time (float): seconds of game time after which the game is stopped
+        pool_size (int): capacity of the pools of entities, defaults to every enemy the game
+            can spawn, so full pools do not change the rules being simulated
+
+    Returns:
+        dict: survival time in seconds, final IQ, enemies stopped, whether the game ended,
+        and the enemy spawns and shuriken throws refused because their pool was full
+    '''
+    if pool_size is None:
+        spawns = int(max_time * 1000 / (spawn_time or get_default_spawn_time(is_easy))) + 1
+        pool_size = max(spawns, GAME_CONSTANTS['ENEMY_NINJA_POOL_SIZE'], GAME_CONSTANTS['SHURIKEN_POOL_SIZE'])
+
+    core = GameCore(
+        is_easy, spawn_time=spawn_time, enemy_speed=enemy_speed,
+        shuriken_speed=shuriken_speed, rng=random.Random(seed), pool_size=pool_size
+    )
+
+    player.start(core)
+
+    while not core.over and core.time < max_time:
+        player.act(core)
+        core.update(step)
+
+    return {
+        'survival_time': core.time,
+        'iq': core.panel.score,
+        'enemies_stopped': core.enemy_ninja_controller.get_retired_count(),
+        'game_over': core.over,
+        'spawns_refused': core.enemy_ninja_controller.store.get_stats()['exhausted'],
+        'throws_refused': core.shuriken_controller.store.get_stats()['exhausted'],
+    }
+
+
+def summarize(results):
+    '''
+    Summarizes the results of many games.
+
+    Args:
+        results (list): dictionaries returned by run_game
+
+    Returns:
+        dict: number of games, games in which a pool refused an entity
+        (their results do not follow the rules), and mean and percentiles
+        of survival time and IQ
+    '''
+    summary = {
+        'games': len(results),
+        'games_refused': sum(1 for result in results if result['spawns_refused'] or result['throws_refused']),
+    }
+
+    for key in ('survival_time', 'iq'):
+        values = sorted(result[key] for result in results)
+
+        summary[key] = {
+            'mean': sum(values) / len(values),
+            'p10': percentile(values, 0.1),
+            'p50': percentile(values, 0.5),
+            'p90': percentile(values, 0.9),
+            'max': values[-1],
+        }
+
+    return summary
+
+
+def run_batch(games, seed=0, answer_time=3.0, answer_time_sd=1.0, accuracy=0.9, **game_options):
+    '''
+    Simulates many games with scripted players, one seed per game.
+
+    Args:
+        games (int): number of games to simulate
+        seed (int): seed of the first game, the others follow it
+        answer_time, answer_time_sd, accuracy: settings of the ScriptedPlayer
+        game_options: keyword arguments passed on to run_game
+
+    Returns:
+        list: dictionaries returned by run_game
+    '''
+    results = []
+
+    for game_seed in range(seed, seed + games):
+        player = ScriptedPlayer(answer_time, answer_time_sd, accuracy, rng=random.Random(-game_seed - 1))
+        results.append(run_game(player, seed=game_seed, **game_options))
+
+    return results
+
+
+def parse_arguments():
+    '''Returns: command line arguments of the simulation'''
+    parser = argparse.ArgumentParser(description='Simulates games of The Meditating Ninja without a display.')
+    parser.add_argument('--games', type=int, default=100, help='number of games to simulate')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--easy', action='store_true', help='simulate the easy difficulty')
+    parser.add_argument('--spawn-time', type=float, help='milliseconds between enemy spawns')
+    parser.add_argument('--enemy-speed', type=float, default=GAME_CONSTANTS['ENEMY_NINJA_SPEED'], help='pixels per second')
+    parser.add_argument('--shuriken-speed', type=float, default=GAME_CONSTANTS['SHURIKEN_SPEED'], help='pixels per second')
+    parser.add_argument('--answer-time', type=float, default=3.0, help='mean seconds to answer a question')
+    parser.add_argument('--answer-time-sd', type=float, default=1.0, help='standard deviation of the answer time')
+    parser.add_argument('--accuracy', type=float, default=0.9, help='probability of a right answer')
+    parser.add_argument('--max-time', type=float, default=600, help='seconds of game time after which a game stops')
+    parser.add_argument('--pool-size', type=int, help='capacity of the pools of entities, defaults to every enemy spawned')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+
+    start = time.perf_counter()
+
+    results = run_batch(
+        arguments.games, arguments.seed, arguments.answer_time, arguments.answer_time_sd, arguments.accuracy,
+        is_easy=arguments.easy, spawn_time=arguments.spawn_time, enemy_speed=arguments.enemy_speed,
+        shuriken_speed=arguments.shuriken_speed, max_time=arguments.max_time, pool_size=arguments.pool_size
+    )
+
+    elapsed = time.perf_counter() - start
+    summary = summarize(results)
+
+    print(f"{summary['games']} games in {elapsed:.2f}s ({summary['games'] / elapsed * 60:.0f} games per minute)")
+
+    if summary['games_refused']:
+        print(f"warning: full pools refused entities in {summary['games_refused']} games, raise --pool-size")
+
+    for key in ('survival_time', 'iq'):
+        statistics = ', '.join(f'{name} {value:.1f}' for name, value in summary[key].items())
+        print(f'{key}: {statistics}')
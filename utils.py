@@ -1,10 +1,62 @@
+import collections
+import io
+import itertools
 import pygame
+import threading
+import time
+from score_store import ScoreIndex, ScoreLog, check_records
+
+
+class TextCache:
+    '''
+    Defines a bounded cache of rendered texts. When it is full, the
+    text used least recently is dropped to make room for a new one.
+    '''
+
+    def __init__(self, max_size=256):
+        '''
+        Args:
+            max_size (int): number of rendered texts kept at most
+        '''
+        self.max_size = max_size
+        self.surfaces = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, font, color):
+        '''Returns: text rendered with a font and color, rendering it if it is not cached'''
+        key = (text, font, tuple(color))
+
+        if key in self.surfaces:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+
+            return self.surfaces[key]
+
+        self.misses += 1
+
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+
+        return surface
+
+    def get_stats(self):
+        '''Returns: dictionary with the number of texts cached, hits and misses'''
+        return {'texts': len(self.surfaces), 'hits': self.hits, 'misses': self.misses}
+
+
+TEXT_CACHE = TextCache()
 
 
 def render_font(text, font, color=[0, 0, 0]):
     '''
     Function that generates text ready to be displayed
-    on screen by pygame.
+    on screen by pygame. Rendered texts are cached, so the
+    surface returned is shared and must not be drawn on.
 
     Args:
         text (string): the text to be rendered
@@ -14,7 +66,99 @@ def render_font(text, font, color=[0, 0, 0]):
     Returns:
         pygame.Surface: text ready to be displayed on screen
     '''
-    return font.render(text, True, color)
+    return TEXT_CACHE.get(text, font, color)
+
+
+class GlyphAtlas:
+    '''
+    Defines a set of glyphs (e.g. digits) rendered once each, which
+    texts made of them are drawn from glyph by glyph. Numbers that
+    change often, like scores, are then drawn without rendering text.
+    Glyphs are only rendered the first time they are drawn.
+    '''
+
+    def __init__(self, font, color=[0, 0, 0]):
+        '''
+        Args:
+            font (pygame.font.Font): font of the glyphs
+            color (list): RGB color of the glyphs
+        '''
+        self.font = font
+        self.color = color
+        self.glyphs = {}
+
+        self.texts_drawn = 0
+
+    def get_glyph(self, glyph):
+        '''Returns: a single glyph rendered, rendering it if this is its first use'''
+        if glyph not in self.glyphs:
+            self.glyphs[glyph] = self.font.render(glyph, True, self.color)
+
+        return self.glyphs[glyph]
+
+    def get_blit_sequence(self, text, position):
+        '''
+        Lays out a text glyph by glyph.
+
+        Args:
+            text (string): the text to be drawn
+            position (list): position of the top left corner of the text
+
+        Returns:
+            list: (glyph surface, position) of each glyph, to be passed to Surface.blits
+        '''
+        x, y = position
+        sequence = []
+
+        for glyph in text:
+            glyph_surface = self.get_glyph(glyph)
+
+            sequence.append((glyph_surface, [x, y]))
+            x += glyph_surface.get_width()
+
+        self.texts_drawn += 1
+
+        return sequence
+
+    def render(self, display, text, position):
+        '''
+        Draws a text glyph by glyph on a given display, with a single call of Surface.blits.
+
+        Args:
+            display (pygame.Surface): surface to draw the text on
+            text (string): the text to be drawn
+            position (list): position of the top left corner of the text
+
+        Returns:
+            pygame.Rect: area of the display touched
+        '''
+        rect = pygame.Rect(position[0], position[1], 0, 0)
+        rect.unionall_ip(display.blits(self.get_blit_sequence(text, position)))
+
+        return rect
+
+    def get_stats(self):
+        '''Returns: dictionary with the number of glyphs rendered and texts drawn from them'''
+        return {'glyphs': len(self.glyphs), 'texts_drawn': self.texts_drawn}
+
+
+def percentile(values, fraction):
+    '''Returns: the value below which a given fraction of the sorted values fall (nearest rank)'''
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+
+    return values[index]
+
+
+def play_music(track):
+    '''
+    Stops the music playing and loops a track instead.
+
+    Args:
+        track (bytes): contents of the music file, e.g. MUSIC_CONSTANTS['GAME']
+    '''
+    pygame.mixer.music.stop()
+    pygame.mixer.music.load(io.BytesIO(track))
+    pygame.mixer.music.play(-1)
 
 
 class Screen:
@@ -23,18 +167,27 @@ class Screen:
     and attributes shared by all game screens.
     '''
 
+    # Color filling the background behind the static content of the screen
+    background_color = [255, 255, 255]
+
+    # Whether the screen manager may keep the screen and show it again
+    reusable = False
+
     def __init__(self, name=''):
         '''
-        Initializes a pygame window, initializes
-        run property, declares next_screen, and
-        stores player name if there is any.
+        Initializes the pygame window (reusing it if it is
+        already open), initializes run property, declares
+        next_screen, and stores player name if there is any.
 
         Args:
             name (string): name of the player, optional.
         '''
 
-        pygame.display.set_caption('The Meditating Ninja')
-        self.screen = pygame.display.set_mode([600, 400])
+        self.screen = pygame.display.get_surface()
+
+        if self.screen is None:
+            pygame.display.set_caption('The Meditating Ninja')
+            self.screen = pygame.display.set_mode([600, 400])
 
         self.run = True
 
@@ -42,6 +195,52 @@ class Screen:
 
         self.name = name
 
+        # Set by bake_background once the screen declared its static content
+        self.background = None
+
+        # Static screens only redraw when something (e.g. input) happened
+        self.needs_redraw = True
+
+    def static_content(self):
+        '''
+        Declares the content of the screen which never changes. Screens
+        override this method, and their static content is baked into a
+        single background surface by bake_background.
+
+        Returns: list of (pygame.Surface, position) pairs, in drawing order
+        '''
+        return []
+
+    def bake_background(self):
+        '''
+        Composites the background color and all static content of the
+        screen into a single surface converted to the display format.
+        Should be called once, at the end of the screen's constructor.
+        '''
+        self.background = pygame.Surface(self.screen.get_size()).convert()
+        self.background.fill(self.background_color)
+        self.background.blits(self.static_content(), doreturn=False)
+
+    def render_background(self):
+        '''Draws the baked background over the whole display'''
+        self.screen.blit(self.background, [0, 0])
+
+    def reopen(self, name=''):
+        '''
+        Prepares a reusable screen to be shown again, as if
+        it had just been constructed.
+
+        Args:
+            name (string): name of the player, optional.
+        '''
+        self.run = True
+
+        self.next_screen = None
+
+        self.name = name
+
+        self.needs_redraw = True
+
     def stop_running(self):
         '''Sets run attribute to false'''
         self.run = False
@@ -51,73 +250,266 @@ class Screen:
         self.next_screen = screen_name
 
 
-class Ranking:
+class ScreenManager:
     '''
-    Class defining a Ranking object. The object is connected to a 
-    textfile. Consider line N (where N is odd) to be the name of 
-    the player and line N + 1 the score of that player.
+    Defines the loop showing the screens of the game one after the
+    other. Each screen runs until it stops, and the screen it set as
+    next is opened in its place. Reusable screens are constructed once
+    and reopened afterwards.
     '''
 
-    def __init__(self, path):
+    def __init__(self, screens, frame_rate=60, profiler=None):
         '''
-        Reads a given textfile and initializes an attribute mapping
-        each name to each score as a dictionary. Initializes an 
-        attribute containing an ordered list of names, and the path
-        to the textfile also becomes an attribute.
+        Initializes the registry of screens, a cache of reusable screens,
+        a clock to cap the frame rate, and a record of the transitions.
 
         Args:
-            path (string): path to the textfile with names and scores.
+            screens (dict): maps each screen name to its Screen class
+            frame_rate (int): frames rendered per second at most, 0 for no cap
+            profiler (FrameProfiler): times every frame shown, optional
+        '''
+        self.screens = screens
+        self.cached_screens = {}
+
+        self.clock = pygame.time.Clock()
+        self.frame_rate = frame_rate
+
+        self.profiler = profiler
+
+        # (previous screen name, screen name, seconds until its first frame was shown)
+        self.transitions = []
+        self.first_frame_time = None  # time.perf_counter() when the first frame was shown
+
+    def open_screen(self, screen_name, name=''):
         '''
-        with open(path, 'r') as f:
-            lines = f.read().splitlines()  # Stores each line in an array
+        Returns: the screen registered under a given name, reopening the
+        cached one if the screen is reusable, constructing it otherwise
+        '''
+        if screen_name in self.cached_screens:
+            screen = self.cached_screens[screen_name]
+            screen.reopen(name)
+
+            return screen
+
+        screen = self.screens[screen_name](name) if name else self.screens[screen_name]()
+
+        if screen.reusable:
+            self.cached_screens[screen_name] = screen
+
+        return screen
+
+    def run(self, screen_name, name=''):
+        '''
+        Shows screens until one stops without a valid next screen, then
+        closes pygame. The time from a screen stopping until the first
+        frame of the next one is shown is recorded in transitions.
+
+        Args:
+            screen_name (string): name of the first screen to be shown
+            name (string): name of the player, optional.
+        '''
+        previous_screen_name = None
+
+        while screen_name in self.screens:
+            started = time.perf_counter()
+
+            active_screen = self.open_screen(screen_name, name)
+            active_screen.render_frame()
+
+            if self.first_frame_time is None:
+                self.first_frame_time = time.perf_counter()
+
+            self.transitions.append((previous_screen_name, screen_name, time.perf_counter() - started))
 
-        players = {}
+            while active_screen.run:
+                if self.profiler:
+                    self.profiler.begin_frame()
 
-        for i in range(0, len(lines) - 1, 2):  # Maps each name to each score
-            players[lines[i]] = int(lines[i + 1])
+                self.clock.tick(self.frame_rate)
 
-        # Creates an ordered list of names based on the player's score.
-        leaderboard = sorted(players, key=players.get, reverse=True)
+                if self.profiler:
+                    self.profiler.mark('wait')
 
-        self.__players = players
-        self.__leaderboard = leaderboard
+                active_screen.render_frame()
 
+                if self.profiler:
+                    self.profiler.end_frame()
+
+            previous_screen_name = screen_name
+            screen_name, name = active_screen.next_screen, active_screen.name
+
+        pygame.quit()
+
+
+class Ranking:
+    '''
+    Class defining a Ranking object. The object is connected to a
+    high scores file, a log where each line records a new high score
+    of a player (files with a name line followed by a score line are
+    migrated). Players are indexed by score in memory, and the index
+    is updated with only the records added since it was last read.
+    '''
+
+    # Outdated records the file may hold, on top of one per player, before it is compacted
+    COMPACTION_SLACK = 1000
+
+    def __init__(self, path):
+        '''
+        Reads a given high scores file and initializes an attribute
+        mapping each name to each score as a dictionary, and an index of
+        the names ordered by score. The path to the file also becomes
+        an attribute.
+
+        Args:
+            path (string): path to the file with names and scores.
+        '''
         self.__path = path
 
+        self.__log = ScoreLog(path)
+
+        self.__players = {}
+        self.__order = {}  # Maps each name to the order in which it first appeared
+        self.__index = ScoreIndex()
+
+        # Games save scores from a background thread. Taken before the lock of the file.
+        self.__lock = threading.RLock()
+
+        self.update()
+
     def update(self):
-        '''Re-runs the constructor to update attributes with changes in textfile'''
-        self.__init__(self.__path)
+        '''Updates attributes with the records added to the file since it was last read'''
+        with self.__lock:
+            records, replaced = self.__log.read_new()
+
+            if replaced:  # Compacted by another game, everything was read again
+                self.__players = {}
+                self.__order = {}
+                self.__index = ScoreIndex()
+
+            for name, score in records:
+                self.apply_record(name, score)
+
+    def apply_record(self, name, score):
+        '''
+        Moves a player to the position of a new score in the index.
+
+        Returns: whether the score was the player's highest
+        '''
+        if name in self.__players:
+            if self.__players[name] >= score:
+                return False
+
+            self.__index.remove((-self.__players[name], self.__order[name], name))
+        else:
+            self.__order[name] = len(self.__order)
+
+        self.__players[name] = score
+        self.__index.insert((-score, self.__order[name], name))
+
+        return True
 
     def export_players(self):
-        '''Re-writes textfile with players and scores stored in the object's attribute'''
-        with open(self.__path, 'w') as f:
-            for player in self.__players.keys():
-                f.write(f'{player}\n')
-                f.write(f'{self.__players[player]}\n')
+        '''
+        Re-writes the file with a single record for each player, dropping
+        outdated ones. Records other games added to the file since it was
+        last read are merged in first, while holding the file's lock.
+        '''
+        with self.__lock, self.__log.lock():
+            self.update()
+
+            self.__log.rewrite(list(self.__players.items()))
 
     def new_record(self, name, score):
         '''
-        Saves a new score to a dictionary (__players attribute) and 
-        updates the textfile. If the player already has a score and 
-        the new one is not their highest, the function does not run.
+        Saves a new score and appends it to the file. If the player
+        already has a score and the new one is not higher, nothing
+        changes.
 
         Args:
             name (string): name of the player
             score (int): score of the player
         '''
-        if name in self.__players and self.__players[name] > score:
-            return
+        self.new_records([(name, score)])
 
-        self.__players[name] = score
+    def new_records(self, records):
+        '''
+        Saves a batch of new scores, appending the ones beating their
+        player's score to the file at once. The file is compacted once
+        it holds many outdated records. Raises ValueError, saving none
+        of the scores, if a name holds a tab or a line break.
+
+        Args:
+            records (list): (name, score) of each new score
+        '''
+        check_records(records)
 
-        self.export_players()
+        with self.__lock:
+            self.update()
 
-        self.update()
+            new_records = [(name, score) for name, score in records if self.apply_record(name, score)]
+
+            if new_records:
+                self.__log.append(new_records)
+
+            if self.__log.records > len(self.__players) + self.COMPACTION_SLACK:
+                self.export_players()
+
+    def get_top(self, count):
+        '''Returns: list of (name, score) of the players with the highest scores, best first'''
+        return self.get_page(0, count)
+
+    def get_page(self, start, count):
+        '''
+        Lists a page of the leaderboard, finding its first player in
+        O(log n) time.
+
+        Args:
+            start (int): rank of the first player listed, 0 for the best
+            count (int): number of players listed, fewer at the end of the leaderboard
+
+        Returns:
+            list: (name, score) of each player of the page, best first
+        '''
+        with self.__lock:
+            return [
+                (name, -negative_score)
+                for negative_score, _, name in itertools.islice(self.__index.iterate_from(start), count)
+            ]
+
+    def get_rank(self, name):
+        '''Returns: rank of a player (1 for the best), in O(log n) time, None if the player has no score'''
+        with self.__lock:
+            if name not in self.__players:
+                return None
+
+            return self.__index.rank((-self.__players[name], self.__order[name], name)) + 1
+
+    def get_count(self):
+        '''Returns: number of players with a score'''
+        return len(self.__players)
 
     def get_leaderboard(self):
-        '''Returns: dictionary that maps names to scores'''
-        return self.__leaderboard
+        '''Returns: list of player names ordered by score'''
+        with self.__lock:
+            return [name for _, _, name in self.__index]
 
     def get_players(self):
-        '''Returns: list of player names ordered by score'''
+        '''Returns: dictionary that maps names to scores'''
         return self.__players
+
+
+# Ranking of each high scores file, shared by the screens reading and writing it
+RANKINGS = {}
+
+
+def get_ranking(path):
+    '''
+    Returns: the Ranking of a given high scores file, created the
+    first time and brought up to date with the file afterwards
+    '''
+    if path not in RANKINGS:
+        RANKINGS[path] = Ranking(path)
+    else:
+        RANKINGS[path].update()
+
+    return RANKINGS[path]
@@ -0,0 +1,198 @@
+'''
+Exports practice worksheets made of the same math questions the game
+asks. Questions are drawn in batches from the question bank of the
+chosen difficulty and streamed to a CSV or JSON lines file sheet by
+sheet, so any number of them can be exported without holding them in
+memory. The same seed always gives the same worksheets.
+
+Usage: python worksheets.py --sheets 100000 --per-sheet 20 --hard --unique --output sheets.csv --answer-key key.csv
+'''
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')  # Keeps the output clean when streamed to stdout
+
+import argparse
+import csv
+import itertools
+import json
+import random
+import sys
+import time
+from game_utils import QUESTION_BANK
+
+QUESTION_FIELDS = ['sheet', 'number', 'question', 'A', 'operation', 'B']
+ANSWER_FIELDS = ['sheet', 'number', 'answer']
+
+
+def get_weighted_facts(is_easy):
+    '''
+    Flattens the question bank of a difficulty, weighting each question
+    so that, as in the game, every operation is equally likely and so
+    is every question of an operation.
+
+    Returns:
+        tuple: list of Facts and list of their cumulative weights
+    '''
+    bank = QUESTION_BANK[is_easy]
+
+    facts = [fact for operation_facts in bank for fact in operation_facts]
+    weights = [1 / (len(bank) * len(operation_facts)) for operation_facts in bank for _ in operation_facts]
+
+    return facts, list(itertools.accumulate(weights))
+
+
+def generate_sheets(is_easy, sheets, per_sheet, rng, unique=False, batch_size=65536):
+    '''
+    Generates worksheets, drawing the questions of many sheets at once.
+
+    Args:
+        is_easy (bool): difficulty of the questions
+        sheets (int): number of worksheets
+        per_sheet (int): questions on each worksheet
+        rng (random.Random): source of random numbers
+        unique (bool): whether a question may only appear once per worksheet
+        batch_size (int): questions drawn at once
+
+    Yields:
+        list: questions (Facts) of each worksheet, in order
+    '''
+    facts, cumulative_weights = get_weighted_facts(is_easy)
+
+    if unique and per_sheet > len(facts):
+        raise ValueError(f'only {len(facts)} different questions exist, {per_sheet} were asked per sheet')
+
+    drawn = iter(())
+
+    for _ in range(sheets):
+        sheet = []
+        seen = set()
+
+        while len(sheet) < per_sheet:
+            fact = next(drawn, None)
+
+            if fact is None:  # Draws the next batch
+                drawn = iter(rng.choices(facts, cum_weights=cumulative_weights, k=batch_size))
+                continue
+
+            if unique:
+                if fact in seen:
+                    continue
+
+                seen.add(fact)
+
+            sheet.append(fact)
+
+        yield sheet
+
+
+class SheetWriter:
+    '''
+    Defines a writer of worksheet rows to an open file, either as CSV
+    (with a header) or as JSON lines.
+    '''
+
+    def __init__(self, file, fields, output_format):
+        '''
+        Args:
+            file (file): text file the rows are written to
+            fields (list): names of the fields of each row
+            output_format (string): 'csv' or 'jsonl'
+        '''
+        self.file = file
+        self.fields = fields
+        self.output_format = output_format
+
+        if output_format == 'csv':
+            self.csv_writer = csv.writer(file)
+            self.csv_writer.writerow(fields)
+
+    def write_rows(self, rows):
+        '''Writes rows given as lists of values, in the order of the fields'''
+        if self.output_format == 'csv':
+            self.csv_writer.writerows(rows)
+        else:
+            self.file.write(''.join(json.dumps(dict(zip(self.fields, row))) + '\n' for row in rows))
+
+
+def export_sheets(sheet_generator, question_writer, answer_writer=None):
+    '''
+    Streams worksheets to their writers, one sheet at a time.
+
+    Args:
+        sheet_generator (generator): worksheets yielded by generate_sheets
+        question_writer (SheetWriter): receives the questions
+        answer_writer (SheetWriter): receives the answer key, optional
+
+    Returns:
+        int: number of questions exported
+    '''
+    exported = 0
+
+    for sheet_number, sheet in enumerate(sheet_generator, 1):
+        question_writer.write_rows(
+            [sheet_number, number, fact.string, fact.A, fact.operation_symbol, fact.B]
+            for number, fact in enumerate(sheet, 1)
+        )
+
+        if answer_writer:
+            answer_writer.write_rows(
+                [sheet_number, number, fact.answer] for number, fact in enumerate(sheet, 1)
+            )
+
+        exported += len(sheet)
+
+    return exported
+
+
+def get_format(path, output_format):
+    '''Returns: the format chosen, or the one matching the file extension (CSV by default)'''
+    if output_format:
+        return output_format
+
+    return 'jsonl' if path and path.endswith(('.jsonl', '.json')) else 'csv'
+
+
+def parse_arguments():
+    '''Returns: command line arguments of the worksheet exporter'''
+    parser = argparse.ArgumentParser(description='Exports worksheets of The Meditating Ninja math questions.')
+    parser.add_argument('--sheets', type=int, default=1, help='number of worksheets')
+    parser.add_argument('--per-sheet', type=int, default=20, help='questions on each worksheet')
+    parser.add_argument('--hard', action='store_true', help='questions of the hard game (+, -, x and /)')
+    parser.add_argument('--unique', action='store_true', help='no question repeated within a worksheet')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random numbers')
+    parser.add_argument('--output', help='file receiving the questions, defaults to the standard output')
+    parser.add_argument('--answer-key', help='file receiving the answers, optional')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='format of the files, defaults to their extension')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_arguments()
+
+    output = open(arguments.output, 'w', newline='') if arguments.output else sys.stdout
+    answer_key = open(arguments.answer_key, 'w', newline='') if arguments.answer_key else None
+
+    start = time.perf_counter()
+
+    try:
+        exported = export_sheets(
+            generate_sheets(
+                not arguments.hard, arguments.sheets, arguments.per_sheet,
+                random.Random(arguments.seed), arguments.unique
+            ),
+            SheetWriter(output, QUESTION_FIELDS, get_format(arguments.output, arguments.format)),
+            SheetWriter(answer_key, ANSWER_FIELDS, get_format(arguments.answer_key, arguments.format))
+            if answer_key else None
+        )
+    except ValueError as error:
+        sys.exit(f'error: {error}')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+        if answer_key:
+            answer_key.close()
+
+    elapsed = time.perf_counter() - start
+    print(f'{exported} questions in {elapsed:.2f}s ({exported / elapsed:.0f} questions per second)', file=sys.stderr)